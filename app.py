@@ -1,16 +1,28 @@
+import hashlib
+import mimetypes
 import os
 import tempfile
 import json
 import shutil
+import time
+import unicodedata
 from datetime import datetime
-from zipfile import ZipFile, ZIP_DEFLATED
+from io import BytesIO
+from typing import Union
+from urllib.parse import quote
 import pytz
 
 from flask import (
-    Flask, render_template, request, send_file, redirect, url_for, flash
+    Flask, render_template, request, send_file, redirect, url_for, flash, jsonify, Response
 )
 
-from barcode_gen import generate_labels_bundle
+from barcode_gen import render_previews
+from blob_store import BlobStore, link_tree, manifest_digests
+from janitor import JOB_PREFIX, load_stats, touch
+from jobs import JOB_DB_PATH, JobQueue, spawn_job_runner
+from label_catalog import SAVED_CATALOG_PATH, SORT_ORDERS, SavedLabelsCatalog, first_png
+from thumbnails import DERIVATIVE_SIZES, load_derivative, write_derivatives
+from zip_stream import png_entries, stream_zip
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret")  # set in prod
@@ -25,6 +37,153 @@ DEFAULT_SAVED_LABELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__
 SAVED_LABELS_DIR = os.environ.get("SAVED_LABELS_DIR", DEFAULT_SAVED_LABELS_DIR)
 os.makedirs(SAVED_LABELS_DIR, exist_ok=True)
 
+# Index of the saved sets (label_catalog.py); the All Labels page pages through it
+SAVED = SavedLabelsCatalog(SAVED_CATALOG_PATH, SAVED_LABELS_DIR)
+SAVED_PER_PAGE = 24
+
+# Saved sets hardlink the job's files; when the job folder is on another
+# filesystem they link to single copies kept here instead
+SAVED_BLOBS = BlobStore(os.path.join(SAVED_LABELS_DIR, ".blobs"))
+
+# Uploads are rendered by the job workers (jobs.py), not in the request
+JOBS = JobQueue(JOB_DB_PATH)
+
+# /jobs/<job>/events holds its connection open only when the web workers
+# can serve other requests meanwhile (gunicorn gthread/gevent, see
+# gunicorn.conf.py). A sync worker would be tied up for the whole stream,
+# so by default it answers with one event and a retry hint, and the job
+# pages poll /jobs/<job>/status instead.
+EVENTS_STREAM = os.environ.get("BARCODE_EVENTS_STREAM", "0") == "1"
+# Streams re-read the job this often, and end before gunicorn's worker
+# timeout; EventSource reconnects on its own
+EVENTS_POLL_INTERVAL = 0.5
+EVENTS_MAX_SECONDS = 20
+EVENTS_RETRY_MS = 1000
+
+# Keep the first complete PNG ZIP of a label set, so later downloads are plain file sends
+ZIP_CACHE = os.environ.get("BARCODE_ZIP_CACHE", "1") != "0"
+
+# A download waits this long for a ZIP the job worker is still building, then streams it instead
+ARTIFACT_WAIT_SECONDS = float(os.environ.get("BARCODE_ARTIFACT_WAIT", "5"))
+ARTIFACT_POLL_INTERVAL = 0.2
+
+
+def _wait_for_artifact(job: str, name: str):
+    deadline = time.monotonic() + ARTIFACT_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        record = JOBS.get(job)
+        state = record["artifacts"].get(name, {}) if record is not None else {}
+        if state.get("status") not in ("pending", "building"):
+            return
+        time.sleep(ARTIFACT_POLL_INTERVAL)
+
+
+# Job and saved-set files never change once written (every job and saved set
+# gets a new folder), so browsers may keep them for a year without asking again
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# With e.g. "/_protected", files are handed to nginx by X-Accel-Redirect
+# (see nginx.conf) and Python only decides whether they may be served
+X_ACCEL_PREFIX = os.environ.get("BARCODE_X_ACCEL_PREFIX", "").rstrip("/")
+
+
+def _touch_job(job: str):
+    """Count a job as used now, so the janitor (janitor.py) keeps it a while longer"""
+    if job.startswith(JOB_PREFIX):
+        touch(os.path.join(OUTPUT_DIR, job))
+
+
+def _attachment(response: Response, download_name: str):
+    """Same Content-Disposition as send_file"""
+    try:
+        download_name.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", download_name).encode("ascii", "ignore").decode("ascii")
+        names = {"filename": simple, "filename*": f"UTF-8''{quote(download_name, safe='!#$&+-.^_`|~')}"}
+    else:
+        names = {"filename": download_name}
+    response.headers.set("Content-Disposition", "attachment", **names)
+
+
+def _internal_uri(path: str) -> Union[str, None]:
+    """nginx internal location of a file under OUTPUT_DIR or SAVED_LABELS_DIR"""
+    real = os.path.realpath(path)
+    for name, root in (("output", OUTPUT_DIR), ("saved", SAVED_LABELS_DIR)):
+        rel = os.path.relpath(real, os.path.realpath(root))
+        if not rel.startswith(os.pardir):
+            return f"{X_ACCEL_PREFIX}/{name}/{quote(rel.replace(os.sep, '/'))}"
+    return None
+
+
+def _send_artifact(path: str, mimetype: Union[str, None] = None, download_name: Union[str, None] = None,
+                   immutable: bool = False):
+    """
+    send_file for job and saved-set files (its mtime/size ETag, conditional
+    GET and Range requests included), cacheable for good when immutable.
+    With BARCODE_X_ACCEL_PREFIX set, nginx sends the bytes instead.
+    """
+    internal = _internal_uri(path) if X_ACCEL_PREFIX else None
+    if internal is not None:
+        response = Response(mimetype=mimetype or mimetypes.guess_type(path)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = internal
+        if download_name is not None:
+            _attachment(response, download_name)
+    else:
+        response = send_file(
+            path, mimetype=mimetype, as_attachment=download_name is not None, download_name=download_name
+        )
+    if immutable:
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def _png_zip_response(folder: str, download_name: str, cache: bool = True):
+    """
+    labels_png.zip if it exists, otherwise the folder's PNGs streamed as a
+    stored ZIP (kept as labels_png.zip with cache, if BARCODE_ZIP_CACHE allows)
+    """
+    path = os.path.join(folder, "labels_png.zip")
+    if os.path.exists(path):
+        return _send_artifact(path, download_name=download_name, immutable=True)
+    png_dir = os.path.join(folder, "png")
+    if not os.path.isdir(png_dir):
+        return "Not found", 404
+
+    response = Response(
+        stream_zip(png_entries(png_dir), cache_path=path if ZIP_CACHE and cache else None),
+        mimetype="application/zip",
+    )
+    _attachment(response, download_name)
+    return response
+
+
+def _send_label(folder: str, fname: str, persist: bool):
+    """A label PNG, or with ?size=thumb|preview its scaled-down derivative (thumbnails.py)"""
+    size = request.args.get("size")
+    if size not in DERIVATIVE_SIZES:
+        path = os.path.join(folder, "png", fname)
+        if not os.path.exists(path):
+            return "Not found", 404
+        return _send_artifact(path, mimetype="image/png", immutable=True)
+    found = load_derivative(folder, fname, size, persist=persist)
+    if found is None:
+        return "Not found", 404
+    data, mimetype = found
+    if not isinstance(data, bytes):
+        return _send_artifact(data, mimetype=mimetype, immutable=True)
+    # Generated in memory: the ETag is the content hash
+    response = send_file(BytesIO(data), mimetype=mimetype, etag=hashlib.sha1(data).hexdigest())
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def _label_images(endpoint: str, fnames: list, **args) -> list:
+    """Preview-size image plus full-size link for each label shown on a page"""
+    return [
+        {"src": url_for(endpoint, fname=fname, size="preview", **args), "full": url_for(endpoint, fname=fname, **args)}
+        for fname in fnames
+    ]
+
 
 @app.route("/", methods=["GET"])
 def index():
@@ -74,49 +233,173 @@ def upload():
     # Store original filename for later use
     original_filename = upload_file.filename
 
+    params = {
+        "xls_or_csv_path": src_path,
+        "format_choice": fmt,
+        "include_price": include_price,
+        "price_value": None,  # Individual prices now come from Column K
+        "out_dir": session_dir,
+        "hot_market": hot_market,
+        "bda_format": bda_format,
+        "round21_brand": round21_brand,
+    }
+
+    # The first few labels are drawn here from the head of the file, so the
+    # results page opens with previews whatever the PO size; the job worker
+    # renders the rest and reuses these through the render cache
     try:
-        # Generate labels (PNGs) + bundle PDF and ZIP
-        results = generate_labels_bundle(
-            xls_or_csv_path=src_path,
-            format_choice=fmt,
-            include_price=include_price,
-            price_value=None,  # Individual prices now come from Column K
-            out_dir=session_dir,
-            hot_market=hot_market,
-            bda_format=bda_format,
-            round21_brand=round21_brand
-        )
-    except Exception as e:
+        previews = [os.path.basename(p) for p in render_previews(**params)]
+    except Exception:
+        # The job reads the whole file and reports what is wrong with it
+        previews = []
+
+    # Generate labels (PNGs) + bundle PDF and ZIP in a job worker
+    job = os.path.basename(session_dir)
+    JOBS.enqueue(job, params, filename=original_filename, return_url=request.referrer, previews=previews)
+
+    if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+        return jsonify({
+            "job": job,
+            "status": "queued",
+            "status_url": url_for("job_status", job=job),
+            "previews": [url_for("preview", job=job, fname=fname) for fname in previews],
+        }), 202
+    return redirect(url_for("job_page", job=job))
+
+
+@app.route("/jobs/<job>", methods=["GET"])
+def job_page(job):
+    """Progress page while the job is queued or running, then its results"""
+    record = JOBS.get(job)
+    if record is None:
+        flash("Job not found.")
+        return redirect(url_for("index"))
+    _touch_job(job)
+
+    if record["status"] == "failed":
         # Be explicit so debugging doesn't eat your life.
-        flash(f"Error while generating labels: {e}")
-        return redirect(request.referrer or url_for("index"))
+        flash(f"Error while generating labels: {record['error']}")
+        return redirect(record["return_url"] or url_for("index"))
+
+    if record["status"] != "done":
+        # With previews the results page opens straight away; downloads appear when the job is done
+        return render_template(
+            "result.html" if record["previews"] else "job_status.html",
+            pending=True,
+            job=job,
+            status=record["status"],
+            sample_pngs=_label_images("preview", record["previews"], job=job),
+            include_price=record["params"]["include_price"],
+            original_filename=record["filename"],
+            status_url=url_for("job_status", job=job),
+            events_url=url_for("job_events", job=job) if EVENTS_STREAM else None,
+        )
 
+    result = record["result"]
     return render_template(
         "result.html",
-        count=len(results["png_paths"]),
-        pdf_path=url_for("download", kind="pdf", job=os.path.basename(session_dir)),
-        zip_path=url_for("download", kind="zip", job=os.path.basename(session_dir)),
-        sample_pngs=[url_for("preview", job=os.path.basename(session_dir), fname=os.path.basename(p)) for p in results["png_paths"][:4]],
-        include_price=include_price,
-        job=os.path.basename(session_dir),
-        original_filename=original_filename
+        count=result["count"],
+        pdf_path=url_for("download", kind="pdf", job=job),
+        zip_path=url_for("download", kind="zip", job=job),
+        sample_pngs=_label_images("preview", result["sample_pngs"], job=job),
+        include_price=record["params"]["include_price"],
+        errors=result["errors"],
+        job=job,
+        original_filename=record["filename"]
+    )
+
+
+@app.route("/jobs/<job>/status", methods=["GET"])
+def job_status(job):
+    """queued / running / done / failed, plus label counts and render stats once done"""
+    record = JOBS.get(job)
+    if record is None:
+        return jsonify({"job": job, "error": "Unknown job"}), 404
+
+    body = {
+        "job": job,
+        "status": record["status"],
+        "filename": record["filename"],
+        "created": record["created"],
+        "started": record["started"],
+        "finished": record["finished"],
+        "progress": record["progress"],
+        "previews": [url_for("preview", job=job, fname=fname) for fname in record["previews"]],
+    }
+    if record["status"] == "queued":
+        body["queue_position"] = JOBS.position(job)
+    elif record["status"] == "done":
+        body["count"] = record["result"]["count"]
+        body["skipped"] = len(record["result"]["errors"])
+        body["result_url"] = url_for("job_page", job=job)
+        body["artifacts"] = record["artifacts"]
+        # Font and render cache hits, dedup counts, Hunter Harms per-page parse times
+        body["stats"] = record["result"].get("stats")
+    elif record["status"] == "failed":
+        body["error"] = record["error"]
+    return jsonify(body)
+
+
+@app.route("/jobs/<job>/events", methods=["GET"])
+def job_events(job):
+    """
+    Server-Sent Events: the job's status and latest progress event, whenever
+    they change. Without BARCODE_EVENTS_STREAM each request gets the current
+    event only, and the retry hint spaces out EventSource's reconnects.
+    """
+    record = JOBS.get(job)
+    if record is None:
+        return jsonify({"job": job, "error": "Unknown job"}), 404
+
+    def stream():
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        last = None
+        deadline = time.monotonic() + EVENTS_MAX_SECONDS
+        while time.monotonic() < deadline:
+            current = JOBS.get(job)
+            if current is None:
+                return
+            event = {"status": current["status"], "progress": current["progress"]}
+            if event != last:
+                yield f"event: progress\ndata: {json.dumps(event)}\n\n"
+                last = event
+            if current["status"] in ("done", "failed"):
+                return
+            time.sleep(EVENTS_POLL_INTERVAL)
+
+    if not EVENTS_STREAM:
+        event = {"status": record["status"], "progress": record["progress"]}
+        body = f"retry: {EVENTS_RETRY_MS}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+    else:
+        body = stream()
+    return Response(
+        body,
+        mimetype="text/event-stream",
+        # nginx must pass events through as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @app.route("/download/<kind>/<job>", methods=["GET"])
 def download(kind, job):
     session_dir = os.path.join(OUTPUT_DIR, job)
+    _touch_job(job)
     if kind == "pdf":
         path = os.path.join(session_dir, "labels_bundle.pdf")
+        # Only a finished job's PDF is final
+        record = JOBS.get(job)
+        immutable = record is not None and record["status"] == "done"
     elif kind == "zip":
-        path = os.path.join(session_dir, "labels_png.zip")
-        # zip lazily if not present
-        if not os.path.exists(path):
-            png_dir = os.path.join(session_dir, "png")
-            with ZipFile(path, "w", ZIP_DEFLATED) as zf:
-                for fname in sorted(os.listdir(png_dir)):
-                    if fname.lower().endswith(".png"):
-                        zf.write(os.path.join(png_dir, fname), arcname=fname)
+        # png/ is only complete once the job is done; a ZIP of it before then would be cut short
+        record = JOBS.get(job)
+        if record is not None and record["status"] in ("queued", "running"):
+            return "Labels are still being generated", 409
+        if record is not None and record["status"] == "failed":
+            return "Not found", 404
+        if not os.path.exists(os.path.join(session_dir, "labels_png.zip")):
+            _wait_for_artifact(job, "zip")
+        # A folder without a queue record isn't known to be complete, so its ZIP isn't kept
+        return _png_zip_response(session_dir, f"{job}_labels_png.zip", cache=record is not None)
     else:
         return "Unknown artifact", 400
 
@@ -124,16 +407,20 @@ def download(kind, job):
         return "Not found", 404
 
     as_name = f"{job}_{os.path.basename(path)}"
-    return send_file(path, as_attachment=True, download_name=as_name)
+    return _send_artifact(path, download_name=as_name, immutable=immutable)
 
 
 @app.route("/preview/<job>/<fname>")
 def preview(job, fname):
     # Serve generated PNGs for quick peek
-    path = os.path.join(OUTPUT_DIR, job, "png", fname)
-    if not os.path.exists(path):
-        return "Not found", 404
-    return send_file(path, mimetype="image/png")
+    _touch_job(job)
+    return _send_label(os.path.join(OUTPUT_DIR, job), fname, persist=True)
+
+
+@app.route("/storage", methods=["GET"])
+def storage():
+    """What the OUTPUT_DIR janitor last found and removed, and its running totals"""
+    return jsonify(load_stats(OUTPUT_DIR))
 
 
 @app.route("/save-labels/<job>")
@@ -143,6 +430,7 @@ def save_labels(job):
     if not os.path.exists(session_dir):
         flash("Label set not found.")
         return redirect(url_for("index"))
+    _touch_job(job)
     
     # Get original filename from the uploaded file in the session directory
     original_filename = "Unknown"
@@ -157,8 +445,8 @@ def save_labels(job):
     saved_dir = os.path.join(SAVED_LABELS_DIR, saved_id)
     os.makedirs(saved_dir, exist_ok=True)
     
-    # Copy files to saved location
-    shutil.copytree(session_dir, saved_dir, dirs_exist_ok=True)
+    # Link files into the saved location (but not a ZIP still being written)
+    link_tree(session_dir, saved_dir, SAVED_BLOBS)
     
     # Create metadata
     metadata = {
@@ -173,86 +461,70 @@ def save_labels(job):
     
     with open(os.path.join(saved_dir, "metadata.json"), "w") as f:
         json.dump(metadata, f)
+    thumbnail = first_png(os.path.join(saved_dir, "png"))
+    if thumbnail is not None:
+        write_derivatives(saved_dir, [thumbnail], ("thumb",))
+    SAVED.add(metadata, thumbnail=thumbnail)
     
     flash(f"Labels saved successfully! ({metadata['count']} labels)")
     return redirect(url_for("all_labels"))
 
 
+def _created_pacific(created: str) -> str:
+    """Saved-set timestamp (UTC ISO) for display in Pacific Time"""
+    try:
+        utc_time = datetime.fromisoformat(created.replace('Z', '+00:00'))
+        pacific_tz = pytz.timezone('America/Los_Angeles')
+        pacific_time = utc_time.astimezone(pacific_tz)
+        return pacific_time.strftime('%Y-%m-%d %H:%M:%S')
+    except:
+        # Fallback to original format if conversion fails
+        return created[:19].replace('T', ' ')
+
+
 @app.route("/all-labels")
 def all_labels():
-    """Display all saved label sets"""
-    saved_sets = []
-    
-    for item in os.listdir(SAVED_LABELS_DIR):
-        item_path = os.path.join(SAVED_LABELS_DIR, item)
-        if os.path.isdir(item_path):
-            metadata_path = os.path.join(item_path, "metadata.json")
-            if os.path.exists(metadata_path):
-                with open(metadata_path, "r") as f:
-                    metadata = json.load(f)
-                
-                # Get first PNG for thumbnail
-                png_dir = os.path.join(item_path, "png")
-                if os.path.exists(png_dir):
-                    png_files = [f for f in os.listdir(png_dir) if f.endswith(".png")]
-                    if png_files:
-                        metadata["thumbnail"] = url_for("saved_preview", saved_id=item, fname=png_files[0])
-                
-                # Handle missing display_name for older saved labels
-                if "display_name" not in metadata:
-                    metadata["display_name"] = metadata.get("original_filename", "Unknown")
-                
-                # Convert UTC timestamp to Pacific Time
-                try:
-                    utc_time = datetime.fromisoformat(metadata["created"].replace('Z', '+00:00'))
-                    pacific_tz = pytz.timezone('America/Los_Angeles')
-                    pacific_time = utc_time.astimezone(pacific_tz)
-                    metadata["created_pacific"] = pacific_time.strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    # Fallback to original format if conversion fails
-                    metadata["created_pacific"] = metadata["created"][:19].replace('T', ' ')
-                
-                saved_sets.append(metadata)
-    
-    # Sort by creation date (newest first)
-    saved_sets.sort(key=lambda x: x["created"], reverse=True)
-    
-    return render_template("all_labels.html", saved_sets=saved_sets)
+    """Display saved label sets, a page at a time"""
+    page = max(request.args.get("page", 1, type=int), 1)
+    sort = request.args.get("sort", "newest")
+    if sort not in SORT_ORDERS:
+        sort = "newest"
+    saved_sets, total = SAVED.list(page=page, per_page=SAVED_PER_PAGE, sort=sort)
+
+    for metadata in saved_sets:
+        if metadata["thumbnail"]:
+            metadata["thumbnail"] = url_for(
+                "saved_preview", saved_id=metadata["id"], fname=metadata["thumbnail"], size="thumb"
+            )
+        metadata["created_pacific"] = _created_pacific(metadata["created"])
+
+    return render_template(
+        "all_labels.html",
+        saved_sets=saved_sets,
+        total=total,
+        page=page,
+        pages=max(1, -(-total // SAVED_PER_PAGE)),
+        sort=sort,
+        sort_orders=list(SORT_ORDERS),
+    )
 
 
 @app.route("/saved-labels/<saved_id>")
 def view_saved_labels(saved_id):
     """View a specific saved label set"""
-    saved_dir = os.path.join(SAVED_LABELS_DIR, saved_id)
-    if not os.path.exists(saved_dir):
+    metadata = SAVED.get(saved_id)
+    if metadata is None:
         flash("Saved label set not found.")
         return redirect(url_for("all_labels"))
     
-    metadata_path = os.path.join(saved_dir, "metadata.json")
-    if not os.path.exists(metadata_path):
-        flash("Invalid saved label set.")
-        return redirect(url_for("all_labels"))
-    
-    with open(metadata_path, "r") as f:
-        metadata = json.load(f)
-    
     # Get PNG files for preview
-    png_dir = os.path.join(saved_dir, "png")
+    png_dir = os.path.join(SAVED_LABELS_DIR, saved_id, "png")
     png_files = []
     if os.path.exists(png_dir):
-        png_files = [f for f in os.listdir(png_dir) if f.endswith(".png")]
+        png_files = sorted(f for f in os.listdir(png_dir) if f.endswith(".png"))
     
-    sample_pngs = [url_for("saved_preview", saved_id=saved_id, fname=f) for f in png_files[:4]]
-    
-    # Convert UTC timestamp to Pacific Time
-    try:
-        utc_time = datetime.fromisoformat(metadata["created"].replace('Z', '+00:00'))
-        pacific_tz = pytz.timezone('America/Los_Angeles')
-        pacific_time = utc_time.astimezone(pacific_tz)
-        created_pacific = pacific_time.strftime('%Y-%m-%d %H:%M:%S')
-    except:
-        # Fallback to original format if conversion fails
-        created_pacific = metadata["created"][:19].replace('T', ' ')
+    sample_pngs = _label_images("saved_preview", png_files[:4], saved_id=saved_id)
+    created_pacific = _created_pacific(metadata["created"])
     
     return render_template(
         "saved_result.html",
@@ -269,75 +541,63 @@ def view_saved_labels(saved_id):
 def saved_download(kind, saved_id):
     """Download files from saved label sets"""
     saved_dir = os.path.join(SAVED_LABELS_DIR, saved_id)
-    if not os.path.exists(saved_dir):
+    metadata = SAVED.get(saved_id)
+    if metadata is None or not os.path.exists(saved_dir):
         return "Not found", 404
-    
-    # Get original filename from metadata
-    metadata_path = os.path.join(saved_dir, "metadata.json")
-    display_name = saved_id
-    if os.path.exists(metadata_path):
-        with open(metadata_path, "r") as f:
-            metadata = json.load(f)
-            display_name = metadata.get("display_name", saved_id)
+    display_name = metadata["display_name"]
     
     if kind == "pdf":
         path = os.path.join(saved_dir, "labels_bundle.pdf")
         as_name = f"{display_name}_labels.pdf"
     elif kind == "zip":
-        path = os.path.join(saved_dir, "labels_png.zip")
-        # Create zip if it doesn't exist
-        if not os.path.exists(path):
-            png_dir = os.path.join(saved_dir, "png")
-            with ZipFile(path, "w", ZIP_DEFLATED) as zf:
-                for fname in sorted(os.listdir(png_dir)):
-                    if fname.lower().endswith(".png"):
-                        zf.write(os.path.join(png_dir, fname), arcname=fname)
-        as_name = f"{display_name}_labels.zip"
+        return _png_zip_response(saved_dir, f"{display_name}_labels.zip")
     else:
         return "Unknown artifact", 400
 
     if not os.path.exists(path):
         return "Not found", 404
 
-    return send_file(path, as_attachment=True, download_name=as_name)
+    return _send_artifact(path, download_name=as_name, immutable=True)
 
 
 @app.route("/saved-preview/<saved_id>/<fname>")
 def saved_preview(saved_id, fname):
     """Serve saved PNGs for preview"""
-    path = os.path.join(SAVED_LABELS_DIR, saved_id, "png", fname)
-    if not os.path.exists(path):
-        return "Not found", 404
-    return send_file(path, mimetype="image/png")
+    # Sets saved before thumbnails get theirs generated in memory, not written into the set
+    return _send_label(os.path.join(SAVED_LABELS_DIR, saved_id), fname, persist=False)
 
 
 @app.route("/delete-saved-labels/<saved_id>")
 def delete_saved_labels(saved_id):
     """Delete a saved label set"""
     saved_dir = os.path.join(SAVED_LABELS_DIR, saved_id)
+    metadata = SAVED.get(saved_id)
     if not os.path.exists(saved_dir):
+        SAVED.remove(saved_id)
         flash("Saved label set not found.")
         return redirect(url_for("all_labels"))
     
     # Get display name for confirmation message
-    display_name = saved_id
-    metadata_path = os.path.join(saved_dir, "metadata.json")
-    if os.path.exists(metadata_path):
-        with open(metadata_path, "r") as f:
-            metadata = json.load(f)
-            display_name = metadata.get("display_name", saved_id)
+    display_name = metadata["display_name"] if metadata is not None else saved_id
     
-    # Delete the entire directory
+    # Delete the entire directory, then any stored copies only it was using
+    blobs = manifest_digests(saved_dir)
     try:
         shutil.rmtree(saved_dir)
         flash(f"Label set '{display_name}' deleted successfully.")
     except Exception as e:
         flash(f"Error deleting label set: {e}")
+    SAVED_BLOBS.prune(blobs)
+    # Keep the index entry only if the set (its metadata.json) survived a failed delete
+    if not os.path.exists(os.path.join(saved_dir, "metadata.json")):
+        SAVED.remove(saved_id)
     
     return redirect(url_for("all_labels"))
 
 
 if __name__ == "__main__":
-    # For local testing only
+    # For local testing only; under the reloader only the serving child runs the job workers
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        spawn_job_runner()
     app.run(host="0.0.0.0", port=5000, debug=True)
 
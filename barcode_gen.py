@@ -1,11 +1,26 @@
 import math
+import multiprocessing
 import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+import openpyxl
 import pandas as pd
 import pdfplumber
+import pypdfium2 as pdfium
 from PIL import Image, ImageDraw, ImageFont
-from barcode import Code128
-from barcode.writer import ImageWriter
-from typing import Union
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from typing import Callable, NamedTuple, Union
+
+from pdf_tables import PDFIUM_LOCK, TableLayout, extract_table, learn_table_layout, page_geometry
+from pdf_vector import PdfLabelCanvas, VectorPage, VectorPdfWriter
+from pdf_writer import StreamingPdfWriter, encode_image
+from render_cache import RenderCache, link_or_copy
 
 
 # ---------------- UPC-A encoding ----------------
@@ -20,6 +35,11 @@ R_CODES = {
 }
 
 
+# Start, center and end guard modules extend below the data bars
+GUARD_MASK = np.zeros(95, dtype=bool)
+GUARD_MASK[0:3] = GUARD_MASK[45:50] = GUARD_MASK[92:95] = True
+
+
 def upc_check_digit(upc11: str) -> str:
     digits = [int(d) for d in upc11]
     odd_sum = sum(digits[0::2])
@@ -39,41 +59,669 @@ def encode_upc(upc12: str) -> str:
     return start_guard + left_encoded + center_guard + right_encoded + end_guard
 
 
-def _load_font(size):
-    # Prioritize Amazon Linux fonts first
-    font_paths = [
-        # Amazon Linux fonts (prioritized)
-        "/usr/share/fonts/google-droid-sans-fonts/DroidSans.ttf",
-        "/usr/share/fonts/google-droid-sans-fonts/DroidSans-Regular.ttf",
-        "/usr/share/fonts/google-noto-vf/NotoSans-VF.ttf",
-        "/usr/share/fonts/google-noto-vf/NotoSans-Regular.ttf",
-        "/usr/share/fonts/nimbus-sans/NimbusSans-Regular.ttf",
-        # Other Linux fonts
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-        "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
-        "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
-        # macOS system fonts (fallback)
-        "/System/Library/Fonts/Arial.ttf",
-        "/System/Library/Fonts/Helvetica.ttc",
-        "/System/Library/Fonts/SF-Pro-Text-Regular.otf",
-        "/System/Library/Fonts/SF-Pro-Display-Regular.otf",
-        "/Library/Fonts/Arial.ttf",
-        "/Library/Fonts/Helvetica.ttc",
+# ---------------- UPC validation ----------------
+
+# Module patterns as ASCII rows, indexed by digit
+_L_BYTES = np.array([list(L_CODES[str(d)].encode("ascii")) for d in range(10)], dtype=np.uint8)
+_R_BYTES = np.array([list(R_CODES[str(d)].encode("ascii")) for d in range(10)], dtype=np.uint8)
+
+
+class UpcColumn(NamedTuple):
+    upc12: list     # UPC-12 per value, None where rejected
+    patterns: list  # encode_upc pattern per value, None where rejected
+    errors: list    # why each value was rejected, None where valid
+
+
+def validate_upcs(values) -> UpcColumn:
+    """
+    Normalize a whole UPC column at once: digits are extracted (a whole
+    number stored as a float, 36000291452.0 or "36000291452.0", loses its
+    ".0"), 11-digit UPCs get their check digit and 12-digit ones have theirs
+    verified, and the bar patterns are assembled, all as array operations
+    over the column rather than per label.
+    """
+    values = list(values)
+    n = len(values)
+    upc12 = np.full(n, None, dtype=object)
+    patterns = np.full(n, None, dtype=object)
+    errors = np.full(n, None, dtype=object)
+    if n == 0:
+        return UpcColumn([], [], [])
+
+    raw = [str(v) for v in values]
+    # Every value in one buffer of code points; row r owns the next len(raw[r]) of them
+    buf = np.frombuffer("".join(raw).encode("utf-32-le"), dtype=np.uint32)
+    lengths = np.fromiter(map(len, raw), dtype=np.int64, count=n)
+    ends = np.cumsum(lengths)
+    row_of = np.repeat(np.arange(n), lengths)
+    is_digit = (buf >= ord("0")) & (buf <= ord("9"))
+    counts = np.bincount(row_of[is_digit], minlength=n)
+
+    # "36000291452.0": digits then ".0", a whole number the sheet stored as a float
+    is_float = lengths >= 3
+    tail = ends[is_float]
+    is_float[is_float] = (buf[tail - 2] == ord(".")) & (buf[tail - 1] == ord("0"))
+    is_float &= counts == lengths - 1
+    is_digit[ends[is_float] - 1] = False
+    counts[is_float] -= 1
+    digits = buf[is_digit] - ord("0")
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    bad_length = np.flatnonzero((counts != 11) & (counts != 12))
+    errors[bad_length] = [f"UPC must have 11 or 12 digits, got '{raw[r]}'" for r in bad_length.tolist()]
+    rows = np.flatnonzero((counts == 11) | (counts == 12))
+    if rows.size == 0:
+        return UpcColumn(upc12.tolist(), patterns.tolist(), errors.tolist())
+
+    body = digits[starts[rows, None] + np.arange(11)]
+    check = (10 - (body[:, 0::2].sum(axis=1) * 3 + body[:, 1::2].sum(axis=1)) % 10) % 10
+    has_check = counts[rows] == 12
+    given = np.where(has_check, digits[np.where(has_check, starts[rows] + 11, 0)], check)
+    good = given == check
+    errors[rows[~good]] = [
+        f"UPC check digit should be {expected}, got '{raw[r]}'"
+        for r, expected in zip(rows[~good].tolist(), check[~good].tolist())
     ]
-    
-    for font_path in font_paths:
-        if os.path.exists(font_path):
+
+    full = np.hstack([body[good], check[good, None]]).astype(np.uint8)
+    k = len(full)
+    guard = np.tile(np.frombuffer(b"101", dtype=np.uint8), (k, 1))
+    modules = np.hstack([
+        guard,
+        _L_BYTES[full[:, :6]].reshape(k, 42),
+        np.tile(np.frombuffer(b"01010", dtype=np.uint8), (k, 1)),
+        _R_BYTES[full[:, 6:]].reshape(k, 42),
+        guard,
+    ])
+    upc12[rows[good]] = (full + ord("0")).view("S12").ravel().astype("U12").tolist()
+    patterns[rows[good]] = np.ascontiguousarray(modules).view("S95").ravel().astype("U95").tolist()
+    return UpcColumn(upc12.tolist(), patterns.tolist(), errors.tolist())
+
+
+def _label_upc(upc_input, upc_pattern: Union[str, None] = None) -> tuple:
+    """(UPC-12, pattern) for a renderer: as validated up front, or validated here"""
+    if upc_pattern is not None:
+        return str(upc_input), upc_pattern
+    column = validate_upcs([upc_input])
+    if column.errors[0] is not None:
+        raise ValueError(column.errors[0])
+    return column.upc12[0], column.patterns[0]
+
+
+# ---------------- Code 128 encoding ----------------
+
+# Bar/space widths of symbol values 0-105, then the stop pattern with its termination bar
+CODE128_WIDTHS = (
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232',
+)
+CODE128_STOP = '2331112'
+CODE128_PATTERNS = tuple(
+    ''.join(('1' if i % 2 == 0 else '0') * int(w) for i, w in enumerate(widths))
+    for widths in CODE128_WIDTHS + (CODE128_STOP,)
+)
+CODE128_START = {'A': 103, 'B': 104, 'C': 105}
+CODE128_SWITCH = {'A': 101, 'B': 100, 'C': 99}
+CODE128_SHIFT = 98
+
+
+def _code128_value(char: str, code_set: str) -> Union[int, None]:
+    """Symbol value of a character in code set A or B, or None if the set lacks it"""
+    o = ord(char)
+    if code_set == 'A':
+        return o - 32 if 32 <= o < 96 else o + 64 if o < 32 else None
+    return o - 32 if 32 <= o < 128 else None
+
+
+def _digit_run(data: str, i: int) -> int:
+    n = i
+    while n < len(data) and data[n].isdigit():
+        n += 1
+    return n - i
+
+
+@lru_cache(maxsize=4096)
+def encode_code128(data: str) -> str:
+    """
+    Module pattern ('1' bar, '0' space) of data as Code 128, from start code
+    to termination bar. Code sets switch the usual way (ISO 15417 Annex E):
+    runs of digits go in set C, two to a symbol, when that is shorter; other
+    text in B, or A for control characters. Only ASCII can be encoded.
+    """
+    if not data:
+        raise ValueError("Code 128 needs at least one character")
+    if not data.isascii():
+        raise ValueError(f"Code 128 can only encode ASCII, got '{data}'")
+
+    def a_or_b(i: int) -> str:
+        # A if a control character comes before any lowercase letter
+        for char in data[i:]:
+            if ord(char) < 32:
+                return 'A'
+            if _code128_value(char, 'A') is None:
+                return 'B'
+        return 'B'
+
+    run = _digit_run(data, 0)
+    code_set = 'C' if run >= 4 or run == len(data) == 2 else a_or_b(0)
+    values = [CODE128_START[code_set]]
+    i = 0
+    while i < len(data):
+        run = _digit_run(data, i)
+        if code_set == 'C':
+            if run >= 2:
+                values.append(int(data[i:i + 2]))
+                i += 2
+                continue
+            code_set = a_or_b(i)
+            values.append(CODE128_SWITCH[code_set])
+            continue
+        # Into C for 4+ digits at the end or 6+ elsewhere; an odd digit stays in A/B
+        if run >= 6 or (run >= 4 and i + run == len(data)):
+            if run % 2:
+                values.append(_code128_value(data[i], code_set))
+                i += 1
+            code_set = 'C'
+            values.append(CODE128_SWITCH[code_set])
+            continue
+        value = _code128_value(data[i], code_set)
+        if value is None:
+            other = 'B' if code_set == 'A' else 'A'
+            # Shifted in on its own if the text after it is better off in this set
+            if i + 1 < len(data) and a_or_b(i + 1) == code_set:
+                values += [CODE128_SHIFT, _code128_value(data[i], other)]
+                i += 1
+                continue
+            code_set = other
+            values.append(CODE128_SWITCH[code_set])
+            continue
+        values.append(value)
+        i += 1
+
+    checksum = (values[0] + sum(pos * value for pos, value in enumerate(values[1:], 1))) % 103
+    return ''.join(CODE128_PATTERNS[value] for value in values + [checksum, 106])
+
+
+# ---------------- Fonts ----------------
+
+# Prioritize Amazon Linux fonts first
+FONT_PATHS = [
+    # Amazon Linux fonts (prioritized)
+    "/usr/share/fonts/google-droid-sans-fonts/DroidSans.ttf",
+    "/usr/share/fonts/google-droid-sans-fonts/DroidSans-Regular.ttf",
+    "/usr/share/fonts/google-noto-vf/NotoSans-VF.ttf",
+    "/usr/share/fonts/google-noto-vf/NotoSans-Regular.ttf",
+    "/usr/share/fonts/nimbus-sans/NimbusSans-Regular.ttf",
+    # Other Linux fonts
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
+    # macOS system fonts (fallback)
+    "/System/Library/Fonts/Arial.ttf",
+    "/System/Library/Fonts/Helvetica.ttc",
+    "/System/Library/Fonts/SF-Pro-Text-Regular.otf",
+    "/System/Library/Fonts/SF-Pro-Display-Regular.otf",
+    "/Library/Fonts/Arial.ttf",
+    "/Library/Fonts/Helvetica.ttc",
+]
+
+# Every size the label renderers ask for; loaded up front by warm_fonts()
+LABEL_FONT_SIZES = (36, 60, 70, 75, 80, 85, 90, 95, 100)
+
+
+class FontRegistry:
+    """
+    Process-wide font cache:
+    - the font file is resolved once (first path in FONT_PATHS that loads)
+    - FreeTypeFont objects are cached per size, least recently used evicted first
+    - hits / misses / evictions are counted so the saving is visible
+    """
+
+    def __init__(self, font_paths: list[str], max_sizes: int = 32):
+        self.font_paths = font_paths
+        self.max_sizes = max(1, max_sizes)
+        self._path = None
+        self._resolved = False
+        self._fonts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def path(self) -> Union[str, None]:
+        """Resolved font file, or None if only Pillow's default font is available"""
+        with self._lock:
+            if not self._resolved:
+                self._resolve()
+            return self._path
+
+    def _resolve(self):
+        for font_path in self.font_paths:
+            if os.path.exists(font_path):
+                try:
+                    ImageFont.truetype(font_path, size=10)
+                except (OSError, IOError):
+                    continue
+                self._path = font_path
+                break
+        self._resolved = True
+
+    def _open(self, size):
+        if self._path:
             try:
-                return ImageFont.truetype(font_path, size=size)
+                return ImageFont.truetype(self._path, size=size)
             except (OSError, IOError):
+                pass
+        # Fallback to default font - but this should never happen on AWS
+        return ImageFont.load_default()
+
+    def get(self, size: int):
+        with self._lock:
+            font = self._fonts.get(size)
+            if font is not None:
+                self._fonts.move_to_end(size)
+                self.hits += 1
+                return font
+
+            self.misses += 1
+            if not self._resolved:
+                self._resolve()
+            font = self._open(size)
+            self._fonts[size] = font
+            while len(self._fonts) > self.max_sizes:
+                self._fonts.popitem(last=False)
+                self.evictions += 1
+            return font
+
+    def warm(self, sizes=LABEL_FONT_SIZES):
+        for size in sizes:
+            self.get(size)
+
+    def clear(self):
+        with self._lock:
+            self._fonts.clear()
+            self._path = None
+            self._resolved = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self._path,
+                "sizes_cached": len(self._fonts),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+FONTS = FontRegistry(FONT_PATHS, max_sizes=int(os.environ.get("BARCODE_FONT_CACHE_SIZE", "32")))
+
+
+@lru_cache(maxsize=4096)
+def _upc_bar_runs(pattern: str) -> tuple:
+    """
+    Merge adjacent dark modules into runs: (first_module, module_count, is_guard).
+    A UPC-A has 30 bars, so this replaces ~60 per-module rectangles with 30.
+    """
+    bits = np.frombuffer(pattern.encode("ascii"), dtype=np.uint8) == ord("1")
+    kind = bits.astype(np.int8) * (1 + GUARD_MASK[:bits.size])  # 0 space, 1 bar, 2 guard bar
+    edges = np.flatnonzero(np.diff(kind, prepend=0, append=0)).tolist()
+    kinds = kind.tolist()
+    return tuple(
+        (start, end - start, kinds[start] == 2)
+        for start, end in zip(edges, edges[1:])
+        if kinds[start]
+    )
+
+
+def _draw_upc_bars(draw, pattern, x0, module_w, bar_top, bar_bottom, guard_extra):
+    """Draw the UPC bars as merged runs (bars span bar_top..bar_bottom inclusive)"""
+    guard_bottom = bar_bottom + guard_extra
+    for start, count, is_guard in _upc_bar_runs(pattern):
+        draw.rectangle(
+            [x0 + start * module_w, bar_top, x0 + (start + count) * module_w - 1, guard_bottom if is_guard else bar_bottom],
+            fill="black",
+        )
+
+
+# ---------------- Canvas ----------------
+
+# Labels are pure black and white, so by default they are rendered bilevel
+# ("1"): 1-bit PNGs and CCITT G4 pages in the PDF. "L" keeps antialiased
+# text in grayscale; "RGB" is the original output.
+LABEL_MODES = ("1", "L", "RGB")
+LABEL_MODE = os.environ.get("BARCODE_LABEL_MODE", "1")
+if LABEL_MODE not in LABEL_MODES:
+    raise ValueError(f"BARCODE_LABEL_MODE must be one of {LABEL_MODES}, got '{LABEL_MODE}'")
+
+
+def _new_canvas(canvas_w: int, canvas_h: int, mode: Union[str, None] = None) -> Image.Image:
+    return Image.new(mode or LABEL_MODE, (canvas_w, canvas_h), "white")
+
+
+def _to_label_mode(img: Image.Image, mode: Union[str, None] = None) -> Image.Image:
+    """Convert to the label mode; bilevel uses a plain 50% threshold (no dithering)"""
+    mode = mode or LABEL_MODE
+    if img.mode == mode:
+        return img
+    if mode == "1":
+        return img.convert("L").point(lambda v: 255 if v >= 128 else 0, mode="1")
+    return img.convert(mode)
+
+
+class RenderedLabel(NamedTuple):
+    code: str
+    out_path: str
+    image: Image.Image
+    vector: Union[VectorPage, None]
+
+
+class LabelCanvas:
+    """
+    What the renderers draw on: the raster label, with every text, rectangle
+    and barcode op mirrored onto a vector PDF page when vector=True, so both
+    outputs share the renderer's layout. Method signatures follow ImageDraw.
+    """
+
+    def __init__(self, canvas_w: int, canvas_h: int, vector: bool = False):
+        self.img = _new_canvas(canvas_w, canvas_h)
+        self._draw = ImageDraw.Draw(self.img)
+        self.vector = PdfLabelCanvas(canvas_w, canvas_h) if vector else None
+
+    def textbbox(self, xy, text, font):
+        return self._draw.textbbox(xy, text, font=font)
+
+    def text(self, xy, text, font, fill="black"):
+        self._draw.text(xy, text, font=font, fill=fill)
+        if self.vector is not None:
+            self.vector.text(xy, text, font)
+
+    def rectangle(self, box, fill="black"):
+        self._draw.rectangle(box, fill=fill)
+        if self.vector is not None:
+            self.vector.rectangle(box)
+
+    def paste(self, image: Image.Image, xy):
+        self.img.paste(image, xy)
+        if self.vector is not None and "code128" in image.info:
+            modules, quiet, module_w, top, bar_h = image.info["code128"]
+            w, h = image.size
+            self.vector.bars(modules, xy[0] + quiet * w, xy[1] + top * h, module_w * w, bar_h * h)
+
+    def vector_page(self) -> Union[VectorPage, None]:
+        return self.vector.page() if self.vector is not None else None
+
+
+def _load_font(size):
+    return FONTS.get(size)
+
+
+def _font_stats_since(before: dict, elsewhere: Union[dict, None] = None) -> dict:
+    """Font cache hits/misses in this process since before, plus those counted elsewhere (pool workers)"""
+    after = FONTS.stats()
+    elsewhere = elsewhere or {}
+    hits = after["hits"] - before["hits"] + elsewhere.get("hits", 0)
+    misses = after["misses"] - before["misses"] + elsewhere.get("misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+    }
+
+
+def warm_fonts():
+    """Resolve the label font and load every size the renderers use (called at worker boot)"""
+    FONTS.warm()
+    return FONTS.stats()
+
+
+# ---------------- Layout plans ----------------
+
+class TextSlot(NamedTuple):
+    """
+    One line of a record's text. x is the left edge for align "left", the
+    right edge for "right", unused for "center". Text longer than long_len
+    characters (if set) is drawn at long_size instead.
+    """
+    field: str
+    size: int
+    y: int
+    align: str = "center"
+    x: int = 0
+    long_len: int = 0
+    long_size: int = 0
+
+
+class WrapSlot(NamedTuple):
+    """
+    Centred text on one line if it fits max_w, else spread over up to three
+    lines (a single long word is truncated). Slots after it move down by the
+    lines past the first.
+    """
+    field: str
+    size: int
+    y: int
+    max_w: int
+    line_h: int
+
+
+class UpcSlot(NamedTuple):
+    """The UPC-A bars (guards extend by guard_extra) and their digits centred below"""
+    x0: int
+    module_w: int
+    bar_top: int
+    bar_bottom: int
+    guard_extra: int
+    digits_size: int
+    digits_y: int
+
+
+class Code128Slot(NamedTuple):
+    """A Code 128 barcode centred at y; slots after it move down by its height"""
+    field: str
+    width: int
+    height: int
+    y: int
+
+
+class LayoutPlan(NamedTuple):
+    canvas_w: int
+    canvas_h: int
+    slots: tuple
+
+
+# A scratch drawing in the label mode, so widths match the label's own textbbox
+_MEASURE = ImageDraw.Draw(_new_canvas(1, 1))
+
+
+@lru_cache(maxsize=16384)
+def _text_width(font_path: Union[str, None], size: int, text: str) -> int:
+    return _MEASURE.textbbox((0, 0), text, font=_load_font(size))[2]
+
+
+def _measure(size: int, text: str) -> int:
+    return _text_width(FONTS.path, size, text)
+
+
+def _upc_slot(canvas_w: int, margin: int, bar_top: int, bar_bottom: int, digits_size: int) -> UpcSlot:
+    module_w = int(max(1, math.floor((canvas_w - 2 * margin) / 95)))
+    guard_extra = int((bar_bottom - bar_top) * 0.12)
+    return UpcSlot(
+        x0=(canvas_w - module_w * 95) // 2,
+        module_w=module_w,
+        bar_top=bar_top,
+        bar_bottom=bar_bottom,
+        guard_extra=guard_extra,
+        digits_size=digits_size,
+        digits_y=bar_bottom + guard_extra + 10,
+    )
+
+
+def _wrap_lines(text: str, size: int, max_w: int) -> list:
+    """The lines a WrapSlot draws"""
+    if _measure(size, text) <= max_w:
+        return [text]
+    words = text.split()
+    if len(words) <= 1:
+        return [text[:40] + "..." if len(text) > 40 else text]
+    if len(words) <= 3:
+        return words
+    # Many words - distribute evenly across 3 lines
+    per_line, remainder = divmod(len(words), 3)
+    lines = []
+    start = 0
+    for i in range(3):
+        end = start + per_line + (1 if i < remainder else 0)
+        lines.append(" ".join(words[start:end]))
+        start = end
+    return lines
+
+
+def _draw_plan(plan: LayoutPlan, texts: dict, vector: bool = False,
+               upc12: Union[str, None] = None, upc_pattern: Union[str, None] = None) -> LabelCanvas:
+    """
+    Draw a record on a plan's canvas. Only the record's text is measured;
+    every other position was fixed when the plan was compiled. Slots are
+    drawn in order (a pasted barcode covers what is under it).
+    """
+    draw = LabelCanvas(plan.canvas_w, plan.canvas_h, vector=vector)
+    shift = 0
+    for slot in plan.slots:
+        if isinstance(slot, TextSlot):
+            text = texts[slot.field]
+            if not text:
                 continue
-    
-    # Fallback to default font - but this should never happen on AWS
+            size = slot.long_size if slot.long_len and len(text) > slot.long_len else slot.size
+            if slot.align == "left":
+                x = slot.x
+            elif slot.align == "right":
+                x = slot.x - _measure(size, text)
+            else:
+                x = (plan.canvas_w - _measure(size, text)) // 2
+            draw.text((x, slot.y + shift), text, font=_load_font(size), fill="black")
+        elif isinstance(slot, WrapSlot):
+            lines = _wrap_lines(texts[slot.field], slot.size, slot.max_w)
+            font = _load_font(slot.size)
+            for i, line in enumerate(lines):
+                x = (plan.canvas_w - _measure(slot.size, line)) // 2
+                draw.text((x, slot.y + shift + i * slot.line_h), line, font=font, fill="black")
+            shift += (len(lines) - 1) * slot.line_h
+        elif isinstance(slot, UpcSlot):
+            _draw_upc_bars(draw, upc_pattern, slot.x0, slot.module_w,
+                           slot.bar_top + shift, slot.bar_bottom + shift, slot.guard_extra)
+            # Human-readable digits centered
+            hr = f"{upc12[0]}  {upc12[1:6]}  {upc12[6:11]}  {upc12[11]}"
+            x = (plan.canvas_w - _measure(slot.digits_size, hr)) // 2
+            draw.text((x, slot.digits_y + shift), hr, font=_load_font(slot.digits_size), fill="black")
+        elif isinstance(slot, Code128Slot):
+            barcode_img = generate_code128_barcode(texts[slot.field], width=slot.width, height=slot.height)
+            draw.paste(barcode_img, ((plan.canvas_w - barcode_img.width) // 2, slot.y + shift))
+            shift += barcode_img.height
+    return draw
+
+
+def _save_label(draw: LabelCanvas, code: str, out_path: str) -> RenderedLabel:
+    """
+    Write the PNG beside out_path and move it into place: out_path may
+    already be a hardlink into the render cache or a saved set, and those
+    must never change under it.
+    """
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp = f"{out_path}.{uuid.uuid4().hex}.tmp"
     try:
-        return ImageFont.load_default()
-    except:
-        # Last resort - create a basic font
-        return ImageFont.load_default()
+        draw.img.save(tmp, "PNG")
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+    return RenderedLabel(code, out_path, draw.img, draw.vector_page())
+
+
+@lru_cache(maxsize=64)
+def _round21_plan(canvas_w: int, canvas_h: int, margin: int) -> LayoutPlan:
+    line2_y = margin + 110
+    upc = _upc_slot(canvas_w, margin, bar_top=line2_y + 100, bar_bottom=canvas_h - 220, digits_size=75)
+    return LayoutPlan(canvas_w, canvas_h, (
+        # Title centered; SKU left and color right below it
+        TextSlot("title", 100, margin),
+        TextSlot("sku", 85, line2_y, align="left", x=margin),
+        TextSlot("color", 85, line2_y, align="right", x=canvas_w - margin),
+        upc,
+        # Optional price line under the digits
+        TextSlot("price", 75, upc.digits_y + 80),
+    ))
+
+
+@lru_cache(maxsize=64)
+def _hot_market_plan(canvas_w: int, canvas_h: int, margin: int) -> LayoutPlan:
+    row2_y = margin + 120
+    # Row 3 sits just under Row 2's lines, the bars 100px under Row 3
+    row3_y = row2_y + 60 + 10
+    return LayoutPlan(canvas_w, canvas_h, (
+        TextSlot("col_j", 100, margin, align="left", x=margin),
+        TextSlot("col_c", 100, margin, align="right", x=canvas_w - margin),
+        WrapSlot("col_b", 60, row2_y, max_w=canvas_w - 2 * 20, line_h=60),
+        TextSlot("row3", 90, row3_y),
+        _upc_slot(canvas_w, margin, bar_top=row3_y + 100, bar_bottom=row3_y + 380, digits_size=80),
+    ))
+
+
+@lru_cache(maxsize=64)
+def _bda_plan(canvas_w: int, canvas_h: int, margin: int) -> LayoutPlan:
+    row2_y = margin + 120
+    row3_y = row2_y + 90
+    bar_top = row3_y + 60 + 70
+    upc = _upc_slot(canvas_w, margin, bar_top=bar_top, bar_bottom=bar_top + 280, digits_size=80)
+    return LayoutPlan(canvas_w, canvas_h, (
+        TextSlot("col_k", 100, margin, align="left", x=margin),
+        TextSlot("col_c", 100, margin, align="right", x=canvas_w - margin),
+        TextSlot("row2", 75, row2_y),
+        WrapSlot("col_b", 70, row3_y, max_w=canvas_w - 2 * 20, line_h=60),
+        upc,
+        TextSlot("col_j", 70, upc.digits_y + 80),
+    ))
+
+
+@lru_cache(maxsize=64)
+def _round21_brand_plan(canvas_w: int, canvas_h: int, margin: int) -> LayoutPlan:
+    row2_y = margin + 120
+    row3_y = row2_y + 120
+    return LayoutPlan(canvas_w, canvas_h, (
+        # Row 1: left blank, Column B on the right
+        TextSlot("col_b", 100, margin, align="right", x=canvas_w - margin),
+        # Row 2: smaller font past 26 characters
+        TextSlot("col_d", 100, row2_y, long_len=26, long_size=70),
+        TextSlot("row3", 80, row3_y),
+        _upc_slot(canvas_w, margin, bar_top=row3_y + 100, bar_bottom=row3_y + 380, digits_size=80),
+    ))
+
+
+@lru_cache(maxsize=64)
+def _hunter_harms_plan(canvas_w: int, canvas_h: int, margin: int) -> LayoutPlan:
+    # Barcode below the title; SKU 15px under the barcode, size 90px under that
+    barcode_y = margin + 120
+    return LayoutPlan(canvas_w, canvas_h, (
+        TextSlot("title", 100, margin),
+        Code128Slot("code", 1200, 80, barcode_y),
+        TextSlot("sku", 85, barcode_y + 15),
+        TextSlot("size", 95, barcode_y + 15 + 90),
+    ))
+
+
+def _hyphenated(left: str, right: str) -> str:
+    return f"{left}-{right}" if left and right else (left or right)
 
 
 def render_label(
@@ -86,75 +734,21 @@ def render_label(
     price_value: Union[str, None] = None,
     canvas_w: int = 1400,
     canvas_h: int = 900,
-    margin: int = 80
+    margin: int = 80,
+    vector: bool = False,
+    upc_pattern: Union[str, None] = None
 ):
-    # Build UPC-12 robustly from 11 or 12 digits
-    digits = ''.join(c for c in str(upc_input) if c.isdigit())
-    if len(digits) == 11:
-        upc12 = digits + upc_check_digit(digits)
-    elif len(digits) == 12:
-        upc12 = digits
-    else:
-        raise ValueError(f"UPC must have 11 or 12 digits, got '{upc_input}'")
-    pattern = encode_upc(upc12)
-
-    # Canvas
-    img = Image.new("RGB", (canvas_w, canvas_h), "white")
-    draw = ImageDraw.Draw(img)
-
-    # Fonts - balanced sizes for readability and fit
-    title_font = _load_font(100)
-    line2_font = _load_font(85)
-    digits_font = _load_font(75)
-
-    # Line 1: Title centered
-    title_txt = (title or "").strip().upper()
-    title_w = draw.textbbox((0, 0), title_txt, font=title_font)[2]
-    draw.text(((canvas_w - title_w) // 2, margin), title_txt, font=title_font, fill="black")
-
-    # Line 2: SKU left, color right
-    sku_txt = (sku or "").strip()
-    color_txt = (color or "").strip().upper()
-    line2_y = margin + 110  # Reduced from 130
-    draw.text((margin, line2_y), sku_txt, font=line2_font, fill="black")
-    color_w = draw.textbbox((0, 0), color_txt, font=line2_font)[2]
-    draw.text((canvas_w - margin - color_w, line2_y), color_txt, font=line2_font, fill="black")
-
-    # Barcode area - adjusted for price space
-    bar_top = line2_y + 100  # Reduced from 120
-    bar_bottom = canvas_h - 220  # Increased bottom margin from 180 to 220
-    bar_height = bar_bottom - bar_top
-
-    modules = len(pattern)  # 95
-    module_w = int(max(1, math.floor((canvas_w - 2 * margin) / modules)))
-    total_w = module_w * modules
-    x0 = (canvas_w - total_w) // 2
-
-    guard_extra = int(bar_height * 0.12)
-
-    for i, bit in enumerate(pattern):
-        if bit == '1':
-            is_guard = (i < 3) or (45 <= i < 50) or (modules - 3 <= i < modules)
-            top = bar_top
-            bottom = bar_bottom + (guard_extra if is_guard else 0)
-            draw.rectangle([x0 + i * module_w, top, x0 + (i + 1) * module_w - 1, bottom], fill="black")
-
-    # Human-readable digits centered
-    hr = f"{upc12[0]}  {upc12[1:6]}  {upc12[6:11]}  {upc12[11]}"
-    hr_w = draw.textbbox((0, 0), hr, font=digits_font)[2]
-    digits_y = bar_bottom + guard_extra + 10
-    draw.text(((canvas_w - hr_w) // 2, digits_y), hr, font=digits_font, fill="black")
-
-    # Optional price line: only if explicitly requested and provided
-    if include_price and price_value:
-        price_txt = str(price_value).strip()
-        pv_w = draw.textbbox((0, 0), price_txt, font=digits_font)[2]
-        price_y = digits_y + 80  # Reduced from 90 to fit better
-        draw.text(((canvas_w - pv_w) // 2, price_y), price_txt, font=digits_font, fill="black")
-
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    img.save(out_path, "PNG")
-    return upc12, out_path
+    # UPC-12 and bars (generate_labels_bundle validates the whole column up front)
+    upc12, pattern = _label_upc(upc_input, upc_pattern)
+    texts = {
+        "title": (title or "").strip().upper(),
+        "sku": (sku or "").strip(),
+        "color": (color or "").strip().upper(),
+        # Only if explicitly requested and provided
+        "price": str(price_value).strip() if include_price and price_value else "",
+    }
+    draw = _draw_plan(_round21_plan(canvas_w, canvas_h, margin), texts, vector, upc12, pattern)
+    return _save_label(draw, upc12, out_path)
 
 
 def render_hot_market_label(
@@ -167,132 +761,34 @@ def render_hot_market_label(
     out_path: str,
     canvas_w: int = 1400,
     canvas_h: int = 900,
-    margin: int = 40
+    margin: int = 40,
+    vector: bool = False,
+    upc_pattern: Union[str, None] = None
 ):
     """
     Render Hot Market format label:
     - Row 1: Left (Column J) + Right (Column C)
-    - Row 2: Column B
+    - Row 2: Column B (wraps onto up to 3 lines)
     - Row 3: Column A - Column E
     - UPC-A barcode at bottom (no price)
     """
-    # Build UPC-12 robustly from 11 or 12 digits
-    digits = ''.join(c for c in str(upc_input) if c.isdigit())
-    if len(digits) == 11:
-        upc12 = digits + upc_check_digit(digits)
-    elif len(digits) == 12:
-        upc12 = digits
-    else:
-        raise ValueError(f"UPC must have 11 or 12 digits, got '{upc_input}'")
-    pattern = encode_upc(upc12)
-
-    # Canvas
-    img = Image.new("RGB", (canvas_w, canvas_h), "white")
-    draw = ImageDraw.Draw(img)
-
-    # Fonts - similar to Round21 but adjusted for 3 rows
-    row1_font = _load_font(100)
-    row2_font = _load_font(60)  # Much smaller font for Row 2
-    row3_font = _load_font(90)
-    digits_font = _load_font(80)
-
-    # Row 1: Column J (left) + Column C (right)
-    col_j_txt = (col_j or "").strip().upper()
-    col_c_txt = (col_c or "").strip().upper()
-    row1_y = margin
-    
-    draw.text((margin, row1_y), col_j_txt, font=row1_font, fill="black")
-    col_c_w = draw.textbbox((0, 0), col_c_txt, font=row1_font)[2]
-    draw.text((canvas_w - margin - col_c_w, row1_y), col_c_txt, font=row1_font, fill="black")
-
-    # Row 2: Column B (centered, with text wrapping up to 3 lines using full width)
-    col_b_txt = (col_b or "").strip().upper()
-    row2_y = row1_y + 120
-    
-    # Use full width for text wrapping (with small margins)
-    text_margin = 20  # Small margin for text
-    max_width = canvas_w - 2 * text_margin  # Full width available for text
-    
-    # Check if text fits on one line
-    col_b_w = draw.textbbox((0, 0), col_b_txt, font=row2_font)[2]
-    
-    if col_b_w <= max_width:
-        # Text fits on one line - center it
-        draw.text(((canvas_w - col_b_w) // 2, row2_y), col_b_txt, font=row2_font, fill="black")
-        row2_actual_height = 60  # Single line height
-    else:
-        # Text too long - split into multiple lines
-        words = col_b_txt.split()
-        if len(words) <= 1:
-            # Single word too long - truncate and center
-            truncated = col_b_txt[:40] + "..." if len(col_b_txt) > 40 else col_b_txt
-            truncated_w = draw.textbbox((0, 0), truncated, font=row2_font)[2]
-            draw.text(((canvas_w - truncated_w) // 2, row2_y), truncated, font=row2_font, fill="black")
-            row2_actual_height = 60
-        else:
-            # Force text into exactly 3 lines for better space utilization
-            if len(words) <= 3:
-                # Few words - one per line
-                lines = words
-            else:
-                # Many words - distribute evenly across 3 lines
-                words_per_line = len(words) // 3
-                remainder = len(words) % 3
-                
-                lines = []
-                start_idx = 0
-                for i in range(3):
-                    if i < remainder:
-                        end_idx = start_idx + words_per_line + 1
-                    else:
-                        end_idx = start_idx + words_per_line
-                    lines.append(" ".join(words[start_idx:end_idx]))
-                    start_idx = end_idx
-            
-            # Draw the lines (centered)
-            for i, line in enumerate(lines):
-                line_w = draw.textbbox((0, 0), line, font=row2_font)[2]
-                draw.text(((canvas_w - line_w) // 2, row2_y + i * 60), line, font=row2_font, fill="black")
-            
-            row2_actual_height = len(lines) * 60  # Dynamic height based on number of lines
-
-    # Row 3: Column A - Column E (centered)
-    col_a_txt = (col_a or "").strip().upper()
-    col_e_txt = (col_e or "").strip().upper()
-    row3_text = f"{col_a_txt}-{col_e_txt}" if col_a_txt and col_e_txt else (col_a_txt or col_e_txt)
-    row3_y = row2_y + row2_actual_height + 10  # Much closer to Row 2
-    row3_w = draw.textbbox((0, 0), row3_text, font=row3_font)[2]
-    draw.text(((canvas_w - row3_w) // 2, row3_y), row3_text, font=row3_font, fill="black")
-
-    # Barcode area - positioned below row 3, move down more and give more height
-    bar_top = row3_y + 100  # More spacing from Row 3 to avoid covering it
-    # Give the barcode more height now that it's positioned correctly
-    bar_bottom = bar_top + 280  # Much more height for barcode bars (280px tall)
-    bar_height = bar_bottom - bar_top
-
-    modules = len(pattern)  # 95
-    module_w = int(max(1, math.floor((canvas_w - 2 * margin) / modules)))
-    total_w = module_w * modules
-    x0 = (canvas_w - total_w) // 2
-
-    guard_extra = int(bar_height * 0.12)
-
-    for i, bit in enumerate(pattern):
-        if bit == '1':
-            is_guard = (i < 3) or (45 <= i < 50) or (modules - 3 <= i < modules)
-            top = bar_top
-            bottom = bar_bottom + (guard_extra if is_guard else 0)
-            draw.rectangle([x0 + i * module_w, top, x0 + (i + 1) * module_w - 1, bottom], fill="black")
-
-    # Human-readable digits centered
-    hr = f"{upc12[0]}  {upc12[1:6]}  {upc12[6:11]}  {upc12[11]}"
-    hr_w = draw.textbbox((0, 0), hr, font=digits_font)[2]
-    digits_y = bar_bottom + guard_extra + 10
-    draw.text(((canvas_w - hr_w) // 2, digits_y), hr, font=digits_font, fill="black")
+    upc12, pattern = _label_upc(upc_input, upc_pattern)
+    texts = {
+        "col_j": (col_j or "").strip().upper(),
+        "col_c": (col_c or "").strip().upper(),
+        "col_b": (col_b or "").strip().upper(),
+        "row3": _hyphenated((col_a or "").strip().upper(), (col_e or "").strip().upper()),
+    }
+    draw = _draw_plan(_hot_market_plan(canvas_w, canvas_h, margin), texts, vector, upc12, pattern)
+    return _save_label(draw, upc12, out_path)
 
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    img.save(out_path, "PNG")
-    return upc12, out_path
+
+def _currency(value: str) -> str:
+    """Column J as $XX.XX when it is a number, else as-is (it might already be formatted)"""
+    try:
+        return f"${float(value.replace('$', '').replace(',', '').strip()):.2f}"
+    except (ValueError, TypeError):
+        return value.upper()
 
 
 def render_bda_label(
@@ -306,7 +802,9 @@ def render_bda_label(
     out_path: str,
     canvas_w: int = 1400,
     canvas_h: int = 900,
-    margin: int = 40
+    margin: int = 40,
+    vector: bool = False,
+    upc_pattern: Union[str, None] = None
 ):
     """
     Render BDA format label:
@@ -314,147 +812,18 @@ def render_bda_label(
     - Row 2: Column L - Column E (centered, hyphenated)
     - Row 3: Column B (centered, text wraps up to 3 lines if needed)
     - Bottom: UPC-A barcode (from Column I)
-    - Below barcode: Column J (centered)
-    """
-    # Build UPC-12 robustly from 11 or 12 digits
-    digits = ''.join(c for c in str(upc_input) if c.isdigit())
-    if len(digits) == 11:
-        upc12 = digits + upc_check_digit(digits)
-    elif len(digits) == 12:
-        upc12 = digits
-    else:
-        raise ValueError(f"UPC must have 11 or 12 digits, got '{upc_input}'")
-    pattern = encode_upc(upc12)
-
-    # Canvas
-    img = Image.new("RGB", (canvas_w, canvas_h), "white")
-    draw = ImageDraw.Draw(img)
-
-    # Fonts - similar to Hot Market
-    row1_font = _load_font(100)
-    row2_font = _load_font(75)  # Slightly bigger font for Row 2
-    row3_font = _load_font(70)  # Smaller font for Row 3 (wrapping text)
-    digits_font = _load_font(80)
-    col_j_font = _load_font(70)  # Font for Column J below barcode
-
-    # Row 1: Column K (left) + Column C (right)
-    col_k_txt = (col_k or "").strip().upper()
-    col_c_txt = (col_c or "").strip().upper()
-    row1_y = margin
-    
-    draw.text((margin, row1_y), col_k_txt, font=row1_font, fill="black")
-    col_c_w = draw.textbbox((0, 0), col_c_txt, font=row1_font)[2]
-    draw.text((canvas_w - margin - col_c_w, row1_y), col_c_txt, font=row1_font, fill="black")
-
-    # Row 2: Column L - Column E (centered, hyphenated)
-    col_l_txt = (col_l or "").strip().upper()
-    col_e_txt = (col_e or "").strip().upper()
-    row2_text = f"{col_l_txt}-{col_e_txt}" if col_l_txt and col_e_txt else (col_l_txt or col_e_txt)
-    row2_y = row1_y + 120
-    row2_w = draw.textbbox((0, 0), row2_text, font=row2_font)[2]
-    draw.text(((canvas_w - row2_w) // 2, row2_y), row2_text, font=row2_font, fill="black")
-
-    # Row 3: Column B (centered, with text wrapping up to 3 lines using full width)
-    col_b_txt = (col_b or "").strip().upper()
-    row3_y = row2_y + 90  # Reduced spacing to move barcode up
-    
-    # Use full width for text wrapping (with small margins)
-    text_margin = 20  # Small margin for text
-    max_width = canvas_w - 2 * text_margin  # Full width available for text
-    
-    # Check if text fits on one line
-    col_b_w = draw.textbbox((0, 0), col_b_txt, font=row3_font)[2]
-    
-    if col_b_w <= max_width:
-        # Text fits on one line - center it
-        draw.text(((canvas_w - col_b_w) // 2, row3_y), col_b_txt, font=row3_font, fill="black")
-        row3_actual_height = 60  # Single line height
-    else:
-        # Text too long - split into multiple lines
-        words = col_b_txt.split()
-        if len(words) <= 1:
-            # Single word too long - truncate and center
-            truncated = col_b_txt[:40] + "..." if len(col_b_txt) > 40 else col_b_txt
-            truncated_w = draw.textbbox((0, 0), truncated, font=row3_font)[2]
-            draw.text(((canvas_w - truncated_w) // 2, row3_y), truncated, font=row3_font, fill="black")
-            row3_actual_height = 60
-        else:
-            # Force text into exactly 3 lines for better space utilization
-            if len(words) <= 3:
-                # Few words - one per line
-                lines = words
-            else:
-                # Many words - distribute evenly across 3 lines
-                words_per_line = len(words) // 3
-                remainder = len(words) % 3
-                
-                lines = []
-                start_idx = 0
-                for i in range(3):
-                    if i < remainder:
-                        end_idx = start_idx + words_per_line + 1
-                    else:
-                        end_idx = start_idx + words_per_line
-                    lines.append(" ".join(words[start_idx:end_idx]))
-                    start_idx = end_idx
-            
-            # Draw the lines (centered)
-            for i, line in enumerate(lines):
-                line_w = draw.textbbox((0, 0), line, font=row3_font)[2]
-                draw.text(((canvas_w - line_w) // 2, row3_y + i * 60), line, font=row3_font, fill="black")
-            
-            row3_actual_height = len(lines) * 60  # Dynamic height based on number of lines
-
-    # Barcode area - positioned below row 3 (moved up)
-    bar_top = row3_y + row3_actual_height + 70  # Reduced spacing from Row 3 to move barcode up
-    bar_bottom = bar_top + 280  # Height for barcode bars (280px tall)
-    bar_height = bar_bottom - bar_top
-
-    modules = len(pattern)  # 95
-    module_w = int(max(1, math.floor((canvas_w - 2 * margin) / modules)))
-    total_w = module_w * modules
-    x0 = (canvas_w - total_w) // 2
-
-    guard_extra = int(bar_height * 0.12)
-
-    for i, bit in enumerate(pattern):
-        if bit == '1':
-            is_guard = (i < 3) or (45 <= i < 50) or (modules - 3 <= i < modules)
-            top = bar_top
-            bottom = bar_bottom + (guard_extra if is_guard else 0)
-            draw.rectangle([x0 + i * module_w, top, x0 + (i + 1) * module_w - 1, bottom], fill="black")
-
-    # Human-readable digits centered
-    hr = f"{upc12[0]}  {upc12[1:6]}  {upc12[6:11]}  {upc12[11]}"
-    hr_w = draw.textbbox((0, 0), hr, font=digits_font)[2]
-    digits_y = bar_bottom + guard_extra + 10
-    draw.text(((canvas_w - hr_w) // 2, digits_y), hr, font=digits_font, fill="black")
-
-    # Column J below barcode (centered, formatted as currency)
-    col_j_value = (col_j or "").strip()
-    # Format as currency: convert to number and format as $XX.XX
-    try:
-        # Try to parse as number
-        num_value = float(str(col_j_value).replace('$', '').replace(',', '').strip())
-        col_j_txt = f"${num_value:.2f}"
-    except (ValueError, TypeError):
-        # If not a number, use as-is (might already be formatted)
-        if col_j_value and not col_j_value.startswith('$'):
-            try:
-                num_value = float(col_j_value.replace(',', '').strip())
-                col_j_txt = f"${num_value:.2f}"
-            except (ValueError, TypeError):
-                col_j_txt = col_j_value.upper()
-        else:
-            col_j_txt = col_j_value.upper()
-    
-    col_j_y = digits_y + 80  # Spacing below UPC digits
-    col_j_w = draw.textbbox((0, 0), col_j_txt, font=col_j_font)[2]
-    draw.text(((canvas_w - col_j_w) // 2, col_j_y), col_j_txt, font=col_j_font, fill="black")
-
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    img.save(out_path, "PNG")
-    return upc12, out_path
+    - Below barcode: Column J (centered, formatted as currency)
+    """
+    upc12, pattern = _label_upc(upc_input, upc_pattern)
+    texts = {
+        "col_k": (col_k or "").strip().upper(),
+        "col_c": (col_c or "").strip().upper(),
+        "row2": _hyphenated((col_l or "").strip().upper(), (col_e or "").strip().upper()),
+        "col_b": (col_b or "").strip().upper(),
+        "col_j": _currency((col_j or "").strip()),
+    }
+    draw = _draw_plan(_bda_plan(canvas_w, canvas_h, margin), texts, vector, upc12, pattern)
+    return _save_label(draw, upc12, out_path)
 
 
 def render_round21_brand_label(
@@ -466,7 +835,9 @@ def render_round21_brand_label(
     out_path: str,
     canvas_w: int = 1400,
     canvas_h: int = 900,
-    margin: int = 40
+    margin: int = 40,
+    vector: bool = False,
+    upc_pattern: Union[str, None] = None
 ):
     """
     Render Round 21 Brand format label:
@@ -475,93 +846,78 @@ def render_round21_brand_label(
     - Row 3: Centered Column A - Column G (hyphenated)
     - Bottom: UPC-A barcode (from Column H)
     """
-    # Build UPC-12 robustly from 11 or 12 digits
-    digits = ''.join(c for c in str(upc_input) if c.isdigit())
-    if len(digits) == 11:
-        upc12 = digits + upc_check_digit(digits)
-    elif len(digits) == 12:
-        upc12 = digits
-    else:
-        raise ValueError(f"UPC must have 11 or 12 digits, got '{upc_input}'")
-    pattern = encode_upc(upc12)
-
-    # Canvas
-    img = Image.new("RGB", (canvas_w, canvas_h), "white")
-    draw = ImageDraw.Draw(img)
-
-    # Fonts
-    row1_font = _load_font(100)
-    row2_font = _load_font(100)
-    row3_font = _load_font(80)
-    digits_font = _load_font(80)
-
-    # Row 1: Left blank, Right Column B
-    col_b_txt = (col_b or "").strip().upper()
-    row1_y = margin
-    
-    # Left side is blank, so only draw Column B on the right
-    if col_b_txt:
-        col_b_w = draw.textbbox((0, 0), col_b_txt, font=row1_font)[2]
-        draw.text((canvas_w - margin - col_b_w, row1_y), col_b_txt, font=row1_font, fill="black")
-
-    # Row 2: Centered Column D (smaller font if > 26 characters)
-    col_d_txt = (col_d or "").strip().upper()
-    row2_y = row1_y + 120
-    
-    if col_d_txt:
-        # Use smaller font if text is longer than 26 characters
-        if len(col_d_txt) > 26:
-            row2_font_small = _load_font(70)  # Smaller font for long text
-            row2_w = draw.textbbox((0, 0), col_d_txt, font=row2_font_small)[2]
-            draw.text(((canvas_w - row2_w) // 2, row2_y), col_d_txt, font=row2_font_small, fill="black")
-        else:
-            row2_w = draw.textbbox((0, 0), col_d_txt, font=row2_font)[2]
-            draw.text(((canvas_w - row2_w) // 2, row2_y), col_d_txt, font=row2_font, fill="black")
-
-    # Row 3: Centered Column A - Column G (hyphenated)
-    col_a_txt = (col_a or "").strip().upper()
-    col_g_txt = (col_g or "").strip().upper()
-    row3_text = f"{col_a_txt}-{col_g_txt}" if col_a_txt and col_g_txt else (col_a_txt or col_g_txt)
-    row3_y = row2_y + 120
-    
-    if row3_text:
-        row3_w = draw.textbbox((0, 0), row3_text, font=row3_font)[2]
-        draw.text(((canvas_w - row3_w) // 2, row3_y), row3_text, font=row3_font, fill="black")
-
-    # Barcode area - positioned below row 3
-    bar_top = row3_y + 100
-    bar_bottom = bar_top + 280  # Height for barcode bars (280px tall)
-    bar_height = bar_bottom - bar_top
-
-    modules = len(pattern)  # 95
-    module_w = int(max(1, math.floor((canvas_w - 2 * margin) / modules)))
-    total_w = module_w * modules
-    x0 = (canvas_w - total_w) // 2
-
-    guard_extra = int(bar_height * 0.12)
-
-    for i, bit in enumerate(pattern):
-        if bit == '1':
-            is_guard = (i < 3) or (45 <= i < 50) or (modules - 3 <= i < modules)
-            top = bar_top
-            bottom = bar_bottom + (guard_extra if is_guard else 0)
-            draw.rectangle([x0 + i * module_w, top, x0 + (i + 1) * module_w - 1, bottom], fill="black")
-
-    # Human-readable digits centered
-    hr = f"{upc12[0]}  {upc12[1:6]}  {upc12[6:11]}  {upc12[11]}"
-    hr_w = draw.textbbox((0, 0), hr, font=digits_font)[2]
-    digits_y = bar_bottom + guard_extra + 10
-    draw.text(((canvas_w - hr_w) // 2, digits_y), hr, font=digits_font, fill="black")
-
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    img.save(out_path, "PNG")
-    return upc12, out_path
+    upc12, pattern = _label_upc(upc_input, upc_pattern)
+    texts = {
+        "col_b": (col_b or "").strip().upper(),
+        "col_d": (col_d or "").strip().upper(),
+        "row3": _hyphenated((col_a or "").strip().upper(), (col_g or "").strip().upper()),
+    }
+    draw = _draw_plan(_round21_brand_plan(canvas_w, canvas_h, margin), texts, vector, upc12, pattern)
+    return _save_label(draw, upc12, out_path)
 
 
 # ---------------- Spreadsheet parsing for formats ----------------
 
-def _parse_round21(path: str) -> list[dict]:
+ROUND21_LAST_COLUMN = 12  # Column L, the last one any Round21 format reads
+
+
+# Text cells read as missing, as pd.read_excel's default na_values does
+EXCEL_NA_STRINGS = frozenset((
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+))
+
+
+def _excel_cell_value(cell):
+    """
+    A cell's value for the Round21 frame: NaN for blanks, errors and the NA
+    strings, whole numbers as int (never 1000.0), other values as stored
     """
+    value = cell.value
+    if value is None or cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC and not isinstance(value, bool):
+        whole = int(value)
+        return whole if whole == value else float(value)
+    if isinstance(value, str) and value in EXCEL_NA_STRINGS:
+        return np.nan
+    return value
+
+
+def _read_round21_xlsx(path: str, start_row: int, max_rows: Union[int, None] = None) -> pd.DataFrame:
+    """
+    Stream the first sheet in openpyxl read-only mode, reading only columns
+    A-L from start_row (0-indexed) through the row before 'Customer PO'
+    (or max_rows rows), so time and memory follow the label rows rather
+    than the workbook size. Blanks and NA strings become NaN as with
+    pd.read_excel; values keep their cell types (no per-column dtype inference).
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[0]
+        ws.reset_dimensions()
+        rows = []
+        max_row = start_row + max_rows if max_rows is not None else None
+        for row in ws.iter_rows(min_row=start_row + 1, max_row=max_row, max_col=ROUND21_LAST_COLUMN):
+            values = [_excel_cell_value(cell) for cell in row]
+            values += [np.nan] * (ROUND21_LAST_COLUMN - len(values))
+            a_val = values[0]
+            if isinstance(a_val, str) and a_val.strip().upper() == "CUSTOMER PO":
+                break
+            rows.append(values)
+    finally:
+        wb.close()
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(
+        rows, columns=range(ROUND21_LAST_COLUMN), index=pd.RangeIndex(start_row, start_row + len(rows)), dtype=object
+    )
+
+
+def _parse_round21(path: str, max_rows: Union[int, None] = None) -> list[dict]:
+    """
+    max_rows: read only this many sheet rows from row 12 (for previews)
+
     Rules:
     1) Values start at ROW 12 (1-indexed) => index 11
     2) Stop when Column A equals 'Customer PO'
@@ -574,101 +930,192 @@ def _parse_round21(path: str) -> list[dict]:
     J: UPC
     K: Price (optional)
     """
-    # Support CSV or XLSX
+    start_row = 11
+    # Support CSV or XLSX. Cells are read as text (CSV) or as they are
+    # (Excel), never with per-column dtype inference: inferred from only the
+    # head (max_rows) it can differ from the full read, and previews would
+    # get other names and text than the job's labels
     if path.lower().endswith(".csv"):
-        df = pd.read_csv(path, header=None)
+        nrows = start_row + max_rows if max_rows is not None else None
+        body = pd.read_csv(path, header=None, nrows=nrows, dtype=str).iloc[start_row:]
     else:
-        # Read Excel file - try with openpyxl engine first, fall back to default
+        # Stream the XLSX with openpyxl; fall back to a full read for other Excel formats
         try:
-            df = pd.read_excel(path, header=None, engine='openpyxl')
+            body = _read_round21_xlsx(path, start_row, max_rows)
         except Exception:
-            df = pd.read_excel(path, header=None)
-
-    start_row = 11
-    records = []
-    nrows, ncols = df.shape
-
-    for r in range(start_row, nrows):
-        a_val = df.iloc[r, 0] if 0 < ncols else None
-        if isinstance(a_val, str) and a_val.strip().upper() == "CUSTOMER PO":
-            break
-
-        # pull fields
-        sku = "" if pd.isna(df.iloc[r, 0]) else str(df.iloc[r, 0]).strip()
-        # Prefer Column C; fall back to Column B if C is blank in their sheet
-        title_val = df.iloc[r, 2] if ncols > 2 else None
-        if pd.isna(title_val) or str(title_val).strip() == "":
-            title_val = df.iloc[r, 1] if ncols > 1 else None
-        title = "" if title_val is None or pd.isna(title_val) else str(title_val).strip()
-        color = "" if (ncols <= 8 or pd.isna(df.iloc[r, 8])) else str(df.iloc[r, 8]).strip()
-        upc_val = df.iloc[r, 7] if ncols > 7 else None  # Column H (index 7)
-        upc = "" if upc_val is None or pd.isna(upc_val) else str(upc_val).strip()
-        price_val = df.iloc[r, 10] if ncols > 10 else None
-        price = "" if price_val is None or pd.isna(price_val) else str(price_val).strip()
-        
+            nrows = start_row + max_rows if max_rows is not None else None
+            body = pd.read_excel(path, header=None, nrows=nrows, dtype=object).iloc[start_row:]
+
+    ncols = body.shape[1]
+    if body.empty or ncols == 0:
+        return []
+
+    def text(frame: pd.DataFrame, c: int) -> pd.Series:
+        """Column c as stripped strings, "" for blanks or a column the sheet lacks"""
+        if c >= ncols:
+            return pd.Series("", index=frame.index, dtype=object)
+        col = frame.iloc[:, c]
+        return col.map(str).astype(object).str.strip().where(col.notna(), "")
+
+    # Stop at the first 'Customer PO' in Column A
+    stop = text(body, 0).str.upper().eq("CUSTOMER PO").to_numpy()
+    if stop.any():
+        body = body.iloc[:int(stop.argmax())]
+        if body.empty:
+            return []
+
+    # Each source column is converted once and shared by every format's fields
+    col = {c: text(body, c) for c in (0, 1, 2, 3, 4, 6, 7, 8, 9, 10, 11)}
+    # Prefer Column C; fall back to Column B if C is blank in their sheet
+    title = col[2].where(col[2] != "", col[1])
+
+    out = pd.DataFrame({
+        "row": body.index + 1,
+        "SKU": col[0],
+        "Title": title,
+        "Color": col[8],
+        "UPC": col[7],  # Column H (index 7)
+        "Price": col[10],
         # Hot Market additional fields
-        hot_market_col_c = "" if (ncols <= 2 or pd.isna(df.iloc[r, 2])) else str(df.iloc[r, 2]).strip()
-        hot_market_col_j = "" if (ncols <= 9 or pd.isna(df.iloc[r, 9])) else str(df.iloc[r, 9]).strip()
-        hot_market_col_b = "" if (ncols <= 1 or pd.isna(df.iloc[r, 1])) else str(df.iloc[r, 1]).strip()
-        hot_market_col_a = "" if (ncols <= 0 or pd.isna(df.iloc[r, 0])) else str(df.iloc[r, 0]).strip()
-        hot_market_col_e = "" if (ncols <= 4 or pd.isna(df.iloc[r, 4])) else str(df.iloc[r, 4]).strip()
-        
+        "HotMarketColC": col[2],
+        "HotMarketColJ": col[9],
+        "HotMarketColB": col[1],
+        "HotMarketColA": col[0],
+        "HotMarketColE": col[4],
         # BDA format additional fields
-        bda_col_k = "" if (ncols <= 10 or pd.isna(df.iloc[r, 10])) else str(df.iloc[r, 10]).strip()
-        bda_col_l = "" if (ncols <= 11 or pd.isna(df.iloc[r, 11])) else str(df.iloc[r, 11]).strip()
-        bda_col_j = "" if (ncols <= 9 or pd.isna(df.iloc[r, 9])) else str(df.iloc[r, 9]).strip()
-        
+        "BDAColK": col[10],
+        "BDAColL": col[11],
+        "BDAColJ": col[9],
+        "BDAColC": col[2],
+        "BDAColB": col[1],
+        "BDAColE": col[4],
         # Round 21 Brand format additional fields
-        brand_col_a = "" if (ncols <= 0 or pd.isna(df.iloc[r, 0])) else str(df.iloc[r, 0]).strip()
-        # Column B (index 1) - ensure we get the actual value, not row number
-        if ncols <= 1:
-            brand_col_b = ""
-        else:
-            col_b_val = df.iloc[r, 1]
-            if pd.isna(col_b_val):
-                brand_col_b = ""
-            else:
-                # Convert to string, handling numeric values properly
-                brand_col_b = str(col_b_val).strip()
-        brand_col_d = "" if (ncols <= 3 or pd.isna(df.iloc[r, 3])) else str(df.iloc[r, 3]).strip()
-        brand_col_g = "" if (ncols <= 6 or pd.isna(df.iloc[r, 6])) else str(df.iloc[r, 6]).strip()
+        "BrandColA": col[0],
+        "BrandColB": col[1],
+        "BrandColD": col[3],
+        "BrandColG": col[6],
+    }, index=body.index)
+
+    # Skip empty or missing-upc rows
+    out = out[(out["UPC"] != "") & (out["SKU"] != "")]
+    if out.empty:
+        return []
+
+    # synthesize a title from the SKU if needed
+    missing_title = out["Title"] == ""
+    if missing_title.any():
+        out.loc[missing_title, "Title"] = (
+            out.loc[missing_title, "SKU"].str.split("-").str[:3].str.join(" ").str.upper()
+        )
+    return out.to_dict("records")
+
+
+class HunterHarmsPage(NamedTuple):
+    page: int  # 1-based page number
+    records: list
+    seconds: float  # time spent extracting this page's table
+    extractor: str  # "layout" (pdfium, learned table box) or "pdfplumber"
+
+
+def _parse_hunter_harms_table(table: list) -> list[dict]:
+    """Records from one page's table; the page ends at the first row with an empty title"""
+    records = []
 
-        # Skip empty or missing-upc rows
-        if not upc or not sku:
+    # Skip header row, process data rows
+    for row_idx, row in enumerate(table[1:], start=2):
+        if len(row) < 13:  # Need at least 13 columns
             continue
 
+        # Extract data from columns
+        title = str(row[0]).strip() if row[0] else ""
+        skus_text = str(row[3]).strip() if row[3] else ""  # Column 4 (0-indexed)
+        color = str(row[5]).strip() if row[5] else ""  # Column 6 (0-indexed)
+
+        # Stop parsing if Column 1 is empty (end of data)
         if not title:
-            # synthesize from SKU if needed
-            title = " ".join(str(sku).split("-")[:3]).upper()
-
-        record = {
-            "row": r + 1,
-            "SKU": sku,
-            "Title": title,
-            "Color": color,
-            "UPC": upc,
-            "Price": price,
-            "HotMarketColC": hot_market_col_c,
-            "HotMarketColJ": hot_market_col_j,
-            "HotMarketColB": hot_market_col_b,
-            "HotMarketColA": hot_market_col_a,
-            "HotMarketColE": hot_market_col_e,
-            "BDAColK": bda_col_k,
-            "BDAColL": bda_col_l,
-            "BDAColJ": bda_col_j,
-            "BDAColC": hot_market_col_c,  # Reuse Column C
-            "BDAColB": hot_market_col_b,  # Reuse Column B
-            "BDAColE": hot_market_col_e,  # Reuse Column E
-            "BrandColA": brand_col_a,
-            "BrandColB": brand_col_b,
-            "BrandColD": brand_col_d,
-            "BrandColG": brand_col_g
-        }
-        records.append(record)
+            break
+
+        # Skip if no SKUs
+        if not skus_text:
+            continue
+
+        # Split SKUs by newlines
+        skus = [sku.strip() for sku in skus_text.split('\n') if sku.strip()]
+
+        # Create one record per SKU (SKU already contains size info)
+        for sku in skus:
+            # Extract size from SKU (last part before the final number)
+            sku_parts = sku.split('-')
+            if len(sku_parts) >= 4:
+                size_from_sku = sku_parts[-2]  # e.g., "S" from "CLUB-TS-BN-S-11"
+            else:
+                size_from_sku = "UNKNOWN"
+
+            records.append({
+                "row": row_idx,
+                "Title": f"{title} - {color}",
+                "SKU": sku,
+                "Size": size_from_sku,
+                "Quantity": 1  # Each SKU represents 1 item
+            })
     return records
 
 
-def _parse_hunter_harms(pdf_path: str) -> list[dict]:
+def _hunter_harms_layout(pdf_path: str) -> tuple:
+    """(page count, table layout learned from the first page or None)"""
+    with PDFIUM_LOCK:
+        try:
+            pdf = pdfium.PdfDocument(pdf_path)
+        except pdfium.PdfiumError:
+            pdf = None
+        if pdf is not None:
+            try:
+                return len(pdf), learn_table_layout(page_geometry(pdf[0])) if len(pdf) else None
+            finally:
+                pdf.close()
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages), None
+
+
+def _parse_hunter_harms_pages(pdf_path: str, page_numbers: list, layout: Union[TableLayout, None] = None) -> list:
+    """
+    Extract the given 1-based pages; each pool task opens the PDF itself.
+    Pages are read through pdfium and their text assigned to the learned
+    table's columns, with no table search; only a page that doesn't match
+    the layout gets pdfplumber's full extract_tables() pass.
+    """
+    results = []
+    pdf = plumber = None
+    try:
+        for page_number in page_numbers:
+            start = time.perf_counter()
+            table = None
+            extractor = "layout"
+            if layout is not None:
+                with PDFIUM_LOCK:
+                    if pdf is None:
+                        pdf = pdfium.PdfDocument(pdf_path)
+                    table = extract_table(page_geometry(pdf[page_number - 1]), layout)
+            if table is None:
+                extractor = "pdfplumber"
+                plumber = plumber or pdfplumber.open(pdf_path)
+                page = plumber.pages[page_number - 1]
+                # Extract table from PDF
+                tables = page.extract_tables()
+                table = tables[0] if tables else None  # Use first table
+                page.close()
+            records = _parse_hunter_harms_table(table) if table else []
+            results.append(HunterHarmsPage(page_number, records, time.perf_counter() - start, extractor))
+    finally:
+        if pdf is not None:
+            with PDFIUM_LOCK:
+                pdf.close()
+        if plumber is not None:
+            plumber.close()
+    return results
+
+
+def _parse_hunter_harms(pdf_path: str, workers: Union[int, None] = None) -> list[dict]:
     """
     Parse Hunter Harms PDF format:
     - Column 1: Title
@@ -676,91 +1123,58 @@ def _parse_hunter_harms(pdf_path: str) -> list[dict]:
     - Column 6: Color
     - Columns 7-12: Size quantities (S, M, L, XL, 2XL, 3XL)
     """
-    records = []
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            # Extract table from PDF
-            tables = page.extract_tables()
-            if not tables:
-                continue
-                
-            table = tables[0]  # Use first table
-            
-            # Skip header row, process data rows
-            for row_idx, row in enumerate(table[1:], start=2):
-                if len(row) < 13:  # Need at least 13 columns
-                    continue
-                    
-                # Extract data from columns
-                title = str(row[0]).strip() if row[0] else ""
-                skus_text = str(row[3]).strip() if row[3] else ""  # Column 4 (0-indexed)
-                color = str(row[5]).strip() if row[5] else ""  # Column 6 (0-indexed)
-                
-                # Stop parsing if Column 1 is empty (end of data)
-                if not title:
-                    break
-                
-                # Skip if no SKUs
-                if not skus_text:
-                    continue
-                
-                # Split SKUs by newlines
-                skus = [sku.strip() for sku in skus_text.split('\n') if sku.strip()]
-                
-                # Extract size quantities from columns 7-12
-                size_columns = row[6:12]  # Columns 7-12 (0-indexed)
-                size_names = ['S', 'M', 'L', 'XL', '2XL', '3XL']
-                
-                # Create one record per SKU (SKU already contains size info)
-                for sku in skus:
-                    # Extract size from SKU (last part before the final number)
-                    sku_parts = sku.split('-')
-                    if len(sku_parts) >= 4:
-                        size_from_sku = sku_parts[-2]  # e.g., "S" from "CLUB-TS-BN-S-11"
-                    else:
-                        size_from_sku = "UNKNOWN"
-                    
-                    records.append({
-                        "row": row_idx,
-                        "Title": f"{title} - {color}",
-                        "SKU": sku,
-                        "Size": size_from_sku,
-                        "Quantity": 1  # Each SKU represents 1 item
-                    })
-    
-    return records
+    return [rec for page in _extract_hunter_harms(pdf_path, workers=workers) for rec in page.records]
 
 
-def generate_code128_barcode(sku: str, width: int = 400, height: int = 100) -> Image.Image:
-    """Generate Code 128 barcode image from SKU"""
+# Quiet zone on each side and margin above and below the bars, in modules
+CODE128_QUIET_MODULES = 2.5
+CODE128_MARGIN_MODULES = 1
+
+
+def generate_code128_barcode(sku: str, width: int = 400, height: int = 100, mode: Union[str, None] = None) -> Image.Image:
+    """
+    Code 128 barcode image of a SKU, in the label mode unless given. The
+    symbol plus quiet zones is scaled to width, bars height modules tall;
+    each module is drawn a whole number of pixels wide (bars centred), so
+    edges are sharp at any width and no resampling is needed. Raises
+    ValueError if the symbol and its quiet zones need more than width pixels
+    at one pixel per module: drawn any narrower, bars would be lost.
+    """
+    mode = mode or LABEL_MODE
     try:
-        code128 = Code128(sku, writer=ImageWriter())
-        barcode_img = code128.render({
-            'module_width': 1,  # Fixed module width
-            'module_height': height,  # Use full height
-            'quiet_zone': 2.5,
-            'font_size': 8,
-            'text_distance': 2.0,
-            'background': 'white',
-            'foreground': 'black',
-            'write_text': False,  # Don't include text - we position it manually
-        })
-        
-        # Resize to desired width while maintaining aspect ratio
-        if barcode_img.width != width:
-            aspect_ratio = barcode_img.height / barcode_img.width
-            new_height = int(width * aspect_ratio)
-            barcode_img = barcode_img.resize((width, new_height), Image.Resampling.LANCZOS)
-        
-        return barcode_img
+        modules = encode_code128(sku)
     except Exception as e:
         # Fallback: create a simple placeholder
-        img = Image.new("RGB", (width, height), "white")
+        img = _new_canvas(width, height, mode)
         draw = ImageDraw.Draw(img)
         draw.text((10, height//2 - 10), f"Error: {str(e)[:50]}", fill="red")
         return img
 
+    scale = width / (len(modules) + 2 * CODE128_QUIET_MODULES)
+    if scale < 1:
+        raise ValueError(
+            f"SKU '{sku}' is too long for a Code 128 barcode {width}px wide "
+            f"({len(modules)} modules plus quiet zones)"
+        )
+    module_px = int(scale)
+    img_h = round(scale * (height + 2 * CODE128_MARGIN_MODULES))
+    top = round(scale * CODE128_MARGIN_MODULES)
+    x0 = (width - len(modules) * module_px) // 2
+
+    row = np.repeat(np.frombuffer(modules.encode("ascii"), dtype=np.uint8) == ord("1"), module_px)
+    pixels = np.full((img_h, width), 255, dtype=np.uint8)
+    pixels[top:img_h - top, x0:x0 + row.size] = np.where(row, 0, 255)
+    barcode_img = _to_label_mode(Image.fromarray(pixels, "L"), mode)
+    # Module layout as fractions of the image size, for vector PDF pages
+    barcode_img.info["code128"] = (
+        modules,
+        x0 / width,
+        module_px / width,
+        top / img_h,
+        (img_h - 2 * top) / img_h,
+    )
+    return barcode_img
+
 
 def render_hunter_harms_label(
     title: str,
@@ -769,46 +1183,366 @@ def render_hunter_harms_label(
     out_path: str,
     canvas_w: int = 1400,
     canvas_h: int = 900,
-    margin: int = 80
+    margin: int = 80,
+    vector: bool = False
 ):
     """Render label for Hunter Harms format with Code 128 barcode"""
-    # Canvas
-    img = Image.new("RGB", (canvas_w, canvas_h), "white")
-    draw = ImageDraw.Draw(img)
-
-    # Fonts
-    title_font = _load_font(100)
-    sku_font = _load_font(85)
-    size_font = _load_font(95)  # Larger size font
-
-    # Title centered at top
-    title_txt = title.strip().upper()
-    title_w = draw.textbbox((0, 0), title_txt, font=title_font)[2]
-    draw.text(((canvas_w - title_w) // 2, margin), title_txt, font=title_font, fill="black")
-
-    # Generate Code 128 barcode (use more width, reduced height)
-    barcode_img = generate_code128_barcode(sku, width=1200, height=80)
-    
-    # Position barcode below title (with more space)
-    barcode_y = margin + 120
-    barcode_x = (canvas_w - barcode_img.width) // 2
-    img.paste(barcode_img, (barcode_x, barcode_y))
+    texts = {"title": title.strip().upper(), "code": sku, "sku": sku.strip(), "size": size.strip()}
+    draw = _draw_plan(_hunter_harms_plan(canvas_w, canvas_h, margin), texts, vector)
+    return _save_label(draw, sku, out_path)
+
+
+# ---------------- Bundle rendering ----------------
+
+# Render processes per job (1 = render in the request process) and records per pool task
+RENDER_WORKERS = int(os.environ.get("BARCODE_RENDER_WORKERS", "1"))
+RENDER_CHUNK_SIZE = max(1, int(os.environ.get("BARCODE_RENDER_CHUNK_SIZE", "50")))
+
+# "raster": PDF pages are the label images; "vector": bars as filled rectangles
+# and text in an embedded font subset, drawn from the same layout as the PNGs
+PDF_BACKENDS = ("raster", "vector")
+PDF_BACKEND = os.environ.get("BARCODE_PDF_BACKEND", "raster")
+if PDF_BACKEND not in PDF_BACKENDS:
+    raise ValueError(f"BARCODE_PDF_BACKEND must be one of {PDF_BACKENDS}, got '{PDF_BACKEND}'")
+
+# Labels rendered by any job are reused by later ones; "" disables the cache
+RENDER_CACHE_DIR = os.environ.get(
+    "BARCODE_RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "barcode_render_cache")
+)
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("BARCODE_RENDER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+RENDER_CACHE = RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES) if RENDER_CACHE_DIR else None
+
+# Render progress is reported at most this often (seconds); stage changes always are
+PROGRESS_INTERVAL = float(os.environ.get("BARCODE_PROGRESS_INTERVAL", "0.5"))
+
+# Render pool processes are started by a fork server (spawned where there is
+# none), never forked from the caller: a job worker has other threads
+# running (the ZIP builder), and a fork could copy their locks mid-use
+RENDER_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if RENDER_POOL_CONTEXT.get_start_method() == "forkserver":
+    # Pool processes start with this module (and numpy, pandas, Pillow) already imported
+    RENDER_POOL_CONTEXT.set_forkserver_preload([__name__])
+
+_render_pool = None
+_render_pool_workers = 0
+_render_pool_lock = threading.Lock()
+
+
+class _Progress:
+    """
+    Sends progress events ({"stage": ..., ...}) to a callback: every stage
+    change, but render counts only every PROGRESS_INTERVAL and at the end,
+    so a slow consumer costs the render loop next to nothing. Reporting is
+    best effort and never fails the job.
+    """
 
-    # SKU centered below barcode
-    sku_txt = sku.strip()
-    sku_y = barcode_y + barcode_img.height + 15
-    sku_w = draw.textbbox((0, 0), sku_txt, font=sku_font)[2]
-    draw.text(((canvas_w - sku_w) // 2, sku_y), sku_txt, font=sku_font, fill="black")
+    def __init__(self, report: Union[Callable[[dict], None], None]):
+        self.report = report
+        self._last = 0.0
 
-    # Size below SKU (more spacing above)
-    size_txt = size.strip()
-    size_y = sku_y + 90  # Increased spacing above size
-    size_w = draw.textbbox((0, 0), size_txt, font=size_font)[2]
-    draw.text(((canvas_w - size_w) // 2, size_y), size_txt, font=size_font, fill="black")
+    def _send(self, event: dict):
+        self._last = time.monotonic()
+        try:
+            self.report(event)
+        except Exception:
+            pass
+
+    def stage(self, stage: str, **fields):
+        if self.report is not None:
+            self._send({"stage": stage, **fields})
+
+    def rendered(self, done: int, total: int):
+        if self.report is not None and (done == total or time.monotonic() - self._last >= PROGRESS_INTERVAL):
+            self._send({"stage": "render", "done": done, "total": total})
+
+
+def _label_filename(format_choice: str, rec: dict, idx: int) -> str:
+    if format_choice == "hunter_harms":
+        fname = f"{rec['SKU']}_{rec['Size']}".replace("/", "-").replace("\\", "-").replace(" ", "_")
+    else:
+        # Use index to ensure unique filenames even if SKU is duplicate
+        fname = f"{rec['SKU']}".replace("/", "-").replace("\\", "-").replace(" ", "_")
+        if idx > 0:  # Add index for duplicates
+            fname = f"{fname}_{idx}"
+    return f"{fname}.png"
 
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    img.save(out_path, "PNG")
-    return sku, out_path
+
+def _label_filenames(format_choice: str, labelled: list) -> list:
+    """
+    _label_filename for each (idx, rec), with the row index added where a
+    name is already taken: label URLs are served as immutable, so two rows
+    (say two Hunter Harms rows with the same SKU and size) must never share
+    a file. A prefix of labelled gets the same names as the whole list.
+    """
+    taken = set()
+    names = []
+    for idx, rec in labelled:
+        fname = _label_filename(format_choice, rec, idx)
+        while fname in taken:
+            fname = f"{fname[:-len('.png')]}_{idx}.png"
+        taken.add(fname)
+        names.append(fname)
+    return names
+
+
+def _check_upcs(format_choice: str, records: list) -> tuple:
+    """
+    Validate every record's UPC before anything is rendered (see
+    validate_upcs). Returns (idx, rec) for the valid records, whose UPC is
+    now the UPC-12 with its pattern in UPCPattern, and an error per rejected
+    row, in the same form as render errors.
+    """
+    if format_choice == "hunter_harms":
+        return list(enumerate(records)), []
+    column = validate_upcs(rec["UPC"] for rec in records)
+    valid = []
+    errors = []
+    for idx, rec in enumerate(records):
+        if column.errors[idx] is not None:
+            errors.append({"row": rec["row"], "SKU": rec["SKU"], "error": column.errors[idx]})
+            continue
+        rec["UPC"] = column.upc12[idx]
+        rec["UPCPattern"] = column.patterns[idx]
+        valid.append((idx, rec))
+    return valid, errors
+
+
+def _label_format(format_choice: str, options: dict) -> str:
+    """Which renderer a record goes to (Round21 variant checkboxes take precedence in this order)"""
+    if format_choice == "hunter_harms":
+        return "hunter_harms"
+    if options["round21_brand"]:
+        return "round21_brand"
+    if options["bda_format"]:
+        return "bda"
+    if options["hot_market"]:
+        return "hot_market"
+    return "round21"
+
+
+# Record fields each renderer reads; together with RENDER_KEY_VERSION they
+# decide whether two labels are identical
+LABEL_FIELDS = {
+    "round21": ("Title", "SKU", "Color", "UPC"),
+    "hot_market": ("HotMarketColJ", "HotMarketColC", "HotMarketColB", "HotMarketColA", "HotMarketColE", "UPC"),
+    "bda": ("BDAColK", "BDAColC", "BDAColB", "BDAColL", "BDAColE", "BDAColJ", "UPC"),
+    "round21_brand": ("BrandColA", "BrandColB", "BrandColD", "BrandColG", "UPC"),
+    "hunter_harms": ("Title", "SKU", "Size"),
+}
+
+# Bump whenever any renderer's output changes, so cached labels are not reused
+RENDER_KEY_VERSION = 2
+LABEL_CANVAS = (1400, 900)
+
+
+def _render_key(format_choice: str, options: dict, rec: dict) -> str:
+    label_format = _label_format(format_choice, options)
+    fields = [str(rec.get(name, "")) for name in LABEL_FIELDS[label_format]]
+    if label_format == "round21" and options["include_price"]:
+        fields.append(str(rec.get("Price", "")))
+    return RenderCache.key(
+        label_format, RENDER_KEY_VERSION, LABEL_CANVAS, LABEL_MODE, options["vector"], FONTS.path, fields
+    )
+
+
+def _render_record(format_choice: str, options: dict, rec: dict, out_png: str):
+    label_format = _label_format(format_choice, options)
+    if label_format == "hunter_harms":
+        return render_hunter_harms_label(
+            title=rec["Title"],
+            sku=rec["SKU"],
+            size=rec["Size"],
+            out_path=out_png,
+            vector=options["vector"]
+        )
+    if label_format == "round21_brand":
+        # Use Round 21 Brand format
+        return render_round21_brand_label(
+            col_a=rec["BrandColA"],
+            col_b=rec["BrandColB"],
+            col_d=rec["BrandColD"],
+            col_g=rec["BrandColG"],
+            upc_input=rec["UPC"],
+            out_path=out_png,
+            vector=options["vector"],
+            upc_pattern=rec.get("UPCPattern")
+        )
+    if label_format == "bda":
+        # Use BDA format
+        return render_bda_label(
+            col_k=rec["BDAColK"],
+            col_c=rec["BDAColC"],
+            col_b=rec["BDAColB"],
+            col_l=rec["BDAColL"],
+            col_e=rec["BDAColE"],
+            col_j=rec["BDAColJ"],
+            upc_input=rec["UPC"],
+            out_path=out_png,
+            vector=options["vector"],
+            upc_pattern=rec.get("UPCPattern")
+        )
+    if label_format == "hot_market":
+        # Use Hot Market format
+        return render_hot_market_label(
+            col_j=rec["HotMarketColJ"],
+            col_c=rec["HotMarketColC"],
+            col_b=rec["HotMarketColB"],
+            col_a=rec["HotMarketColA"],
+            col_e=rec["HotMarketColE"],
+            upc_input=rec["UPC"],
+            out_path=out_png,
+            vector=options["vector"],
+            upc_pattern=rec.get("UPCPattern")
+        )
+    # Use standard Round21 format
+    include_price = options["include_price"]
+    return render_label(
+        title=rec["Title"],
+        sku=rec["SKU"],
+        color=rec["Color"],
+        upc_input=rec["UPC"],
+        out_path=out_png,
+        include_price=include_price,
+        price_value=rec["Price"] if include_price else None,
+        vector=options["vector"],
+        upc_pattern=rec.get("UPCPattern")
+    )
+
+
+def _render_chunk(format_choice: str, options: dict, chunk: list) -> list:
+    """
+    Render (idx, rec, out_png, key) jobs. Returns (idx, page, error, cached) per
+    job, where page is the label's vector page or its image already
+    compressed for the PDF, so pool workers only send back a few KB per label.
+    Labels found in the render cache are linked into place, not rendered.
+    """
+    cache = RENDER_CACHE if options["cache"] else None
+    results = []
+    for idx, rec, out_png, key in chunk:
+        page = cache.fetch(key, out_png) if cache is not None else None
+        if page is not None:
+            results.append((idx, page, None, True))
+            continue
+        try:
+            label = _render_record(format_choice, options, rec, out_png)
+        except Exception as e:
+            results.append((idx, None, str(e), False))
+            continue
+        page = label.vector if label.vector is not None else encode_image(label.image)
+        if cache is not None:
+            cache.store(key, out_png, page)
+        results.append((idx, page, None, False))
+    return results
+
+
+def _render_chunk_counted(format_choice: str, options: dict, chunk: list) -> tuple:
+    """_render_chunk in a pool worker, plus the font cache hits/misses it took there"""
+    before = FONTS.stats()
+    results = _render_chunk(format_choice, options, chunk)
+    return results, _font_stats_since(before)
+
+
+def _get_render_pool(workers: int) -> ProcessPoolExecutor:
+    """One warm pool per process, rebuilt if the worker count changes or it broke"""
+    global _render_pool, _render_pool_workers
+    with _render_pool_lock:
+        broken = _render_pool is not None and getattr(_render_pool, "_broken", False)
+        if _render_pool is None or broken or _render_pool_workers != workers:
+            if _render_pool is not None:
+                _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=RENDER_POOL_CONTEXT, initializer=warm_fonts
+            )
+            _render_pool_workers = workers
+        return _render_pool
+
+
+def shutdown_render_pool():
+    """Stop this process's render pool, if it has one (its processes outlive a killed owner otherwise)"""
+    global _render_pool, _render_pool_workers
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=True, cancel_futures=True)
+        _render_pool = None
+        _render_pool_workers = 0
+
+
+def _extract_hunter_harms(pdf_path: str, workers: Union[int, None] = None,
+                          max_pages: Union[int, None] = None) -> list:
+    """
+    HunterHarmsPage per page (or the first max_pages), in page order. The
+    table layout is learned once from the first page and shared by every
+    batch. With more than one worker the pages are split into small batches
+    across the render pool, since table extraction is CPU-bound and pages
+    don't depend on each other.
+    """
+    workers = RENDER_WORKERS if workers is None else workers
+    page_count, layout = _hunter_harms_layout(pdf_path)
+    if max_pages is not None:
+        page_count = min(page_count, max_pages)
+    page_numbers = list(range(1, page_count + 1))
+    if workers <= 1 or page_count <= 1:
+        return _parse_hunter_harms_pages(pdf_path, page_numbers, layout)
+
+    # A few batches per worker evens out slow pages without reopening the PDF per page
+    batch = max(1, math.ceil(page_count / (workers * 4)))
+    pool = _get_render_pool(workers)
+    futures = [
+        pool.submit(_parse_hunter_harms_pages, pdf_path, page_numbers[i:i + batch], layout)
+        for i in range(0, page_count, batch)
+    ]
+    return [page for future in futures for page in future.result()]
+
+
+def _iter_rendered(format_choice: str, options: dict, jobs: list, workers: Union[int, None] = None,
+                   pool_fonts: Union[dict, None] = None):
+    """
+    Yield (idx, page, error, cached) in record order as labels are rendered.
+    pool_fonts, if given, collects the font cache hits/misses of the pool workers.
+    """
+    workers = RENDER_WORKERS if workers is None else workers
+    if workers <= 1 or len(jobs) <= RENDER_CHUNK_SIZE:
+        for job in jobs:
+            yield from _render_chunk(format_choice, options, [job])
+        return
+
+    pool = _get_render_pool(workers)
+    chunks = deque(jobs[i:i + RENDER_CHUNK_SIZE] for i in range(0, len(jobs), RENDER_CHUNK_SIZE))
+    in_flight = deque()
+    while chunks or in_flight:
+        # Keep a couple of chunks per worker queued so finished pages never pile up
+        while chunks and len(in_flight) < workers * 2:
+            chunk = chunks.popleft()
+            in_flight.append((chunk, pool.submit(_render_chunk_counted, format_choice, options, chunk)))
+        chunk, future = in_flight.popleft()
+        try:
+            results, fonts = future.result()
+        except Exception as e:
+            # Worker died (e.g. killed for memory); only this chunk's rows are lost
+            yield from ((idx, None, f"render worker failed: {e}", False) for idx, *_ in chunk)
+            continue
+        if pool_fonts is not None:
+            for name in ("hits", "misses"):
+                pool_fonts[name] = pool_fonts.get(name, 0) + fonts[name]
+        yield from results
+
+
+def _render_options(include_price: bool, hot_market: bool, bda_format: bool, round21_brand: bool,
+                    pdf_backend: Union[str, None], use_cache: bool) -> dict:
+    pdf_backend = pdf_backend or PDF_BACKEND
+    if pdf_backend not in PDF_BACKENDS:
+        raise ValueError(f"Unsupported PDF backend: {pdf_backend}")
+    return {
+        "include_price": include_price,
+        "hot_market": hot_market,
+        "bda_format": bda_format,
+        "round21_brand": round21_brand,
+        # Vector text needs a real font file; Pillow's built-in font can only be rasterized
+        "vector": pdf_backend == "vector" and FONTS.path is not None,
+        "cache": use_cache,
+    }
 
 
 def generate_labels_bundle(
@@ -819,106 +1553,197 @@ def generate_labels_bundle(
     out_dir: str,
     hot_market: bool = False,
     bda_format: bool = False,
-    round21_brand: bool = False
+    round21_brand: bool = False,
+    workers: Union[int, None] = None,
+    pdf_backend: Union[str, None] = None,
+    use_cache: bool = True,
+    progress: Union[Callable[[dict], None], None] = None
 ) -> dict:
     """
+    workers: render processes, also used to extract Hunter Harms pages
+             (defaults to BARCODE_RENDER_WORKERS; 1 runs in-process)
+    pdf_backend: "raster" or "vector" (defaults to BARCODE_PDF_BACKEND)
+    use_cache: reuse labels from the render cache (BARCODE_RENDER_CACHE_DIR)
+    progress: called with {"stage": "parsed", "records": N, "invalid": n},
+              {"stage": "render", "done": k, "total": N} (throttled),
+              and {"stage": "pdf", "pages": n}
+
     Returns dict with:
       png_paths: list[str]
+      errors: list[dict] (row, SKU, error) for rows with a bad UPC or that
+              failed to render, in row order
       pdf_path: str
-      zip_path: str (created lazily by app.py if missing)
+      zip_path: str (built by the job worker afterwards, or streamed by app.py)
+      stats: dict (font and render cache hits/misses, unique labels rendered,
+             Hunter Harms per-page extraction times)
     """
     format_choice = (format_choice or "").lower()
     if format_choice not in ("round21", "hunter_harms"):
         raise ValueError(f"Unsupported format: {format_choice}")
 
+    progress = _Progress(progress)
+    parse_stats = None
     if format_choice == "round21":
         records = _parse_round21(xls_or_csv_path)
     elif format_choice == "hunter_harms":
-        records = _parse_hunter_harms(xls_or_csv_path)
+        pages = _extract_hunter_harms(xls_or_csv_path, workers=workers)
+        records = [rec for page in pages for rec in page.records]
+        parse_stats = {
+            "pages": [
+                {
+                    "page": page.page,
+                    "records": len(page.records),
+                    "seconds": round(page.seconds, 4),
+                    "extractor": page.extractor,
+                }
+                for page in pages
+            ],
+        }
+
+    # A bad UPC is reported before rendering starts; a file without a single
+    # good one fails here rather than after a pass over every row
+    labelled, upc_errors = _check_upcs(format_choice, records)
+    if upc_errors and not labelled:
+        raise ValueError(f"No valid UPCs in {len(records)} rows (row {upc_errors[0]['row']}: {upc_errors[0]['error']})")
+    progress.stage("parsed", records=len(records), invalid=len(upc_errors))
+
+    options = _render_options(include_price, hot_market, bda_format, round21_brand, pdf_backend, use_cache)
+    vector = options["vector"]
+
+    fonts_before = FONTS.stats()
+    pool_fonts = {}
 
     # Render all
     png_dir = os.path.join(out_dir, "png")
     os.makedirs(png_dir, exist_ok=True)
-    png_paths = []
+    jobs = [
+        (idx, rec, os.path.join(png_dir, fname), _render_key(format_choice, options, rec))
+        for (idx, rec), fname in zip(labelled, _label_filenames(format_choice, labelled))
+    ]
 
-    for idx, rec in enumerate(records):
-        if format_choice == "round21":
-            # Use index to ensure unique filenames even if SKU is duplicate
-            fname = f"{rec['SKU']}".replace("/", "-").replace("\\", "-").replace(" ", "_")
-            if idx > 0:  # Add index for duplicates
-                fname = f"{fname}_{idx}"
-            out_png = os.path.join(png_dir, f"{fname}.png")
-            
-            if round21_brand:
-                # Use Round 21 Brand format
-                render_round21_brand_label(
-                    col_a=rec["BrandColA"],
-                    col_b=rec["BrandColB"],
-                    col_d=rec["BrandColD"],
-                    col_g=rec["BrandColG"],
-                    upc_input=rec["UPC"],
-                    out_path=out_png
-                )
-            elif bda_format:
-                # Use BDA format
-                render_bda_label(
-                    col_k=rec["BDAColK"],
-                    col_c=rec["BDAColC"],
-                    col_b=rec["BDAColB"],
-                    col_l=rec["BDAColL"],
-                    col_e=rec["BDAColE"],
-                    col_j=rec["BDAColJ"],
-                    upc_input=rec["UPC"],
-                    out_path=out_png
-                )
-            elif hot_market:
-                # Use Hot Market format
-                render_hot_market_label(
-                    col_j=rec["HotMarketColJ"],
-                    col_c=rec["HotMarketColC"],
-                    col_b=rec["HotMarketColB"],
-                    col_a=rec["HotMarketColA"],
-                    col_e=rec["HotMarketColE"],
-                    upc_input=rec["UPC"],
-                    out_path=out_png
-                )
-            else:
-                # Use standard Round21 format
-                render_label(
-                    title=rec["Title"],
-                    sku=rec["SKU"],
-                    color=rec["Color"],
-                    upc_input=rec["UPC"],
-                    out_path=out_png,
-                    include_price=include_price,
-                    price_value=rec["Price"] if include_price else None
-                )
-        elif format_choice == "hunter_harms":
-            fname = f"{rec['SKU']}_{rec['Size']}".replace("/", "-").replace("\\", "-").replace(" ", "_")
-            out_png = os.path.join(png_dir, f"{fname}.png")
-            render_hunter_harms_label(
-                title=rec["Title"],
-                sku=rec["SKU"],
-                size=rec["Size"],
-                out_path=out_png
-            )
-        png_paths.append(out_png)
+    # Records that would draw the same label are rendered once; each repeat
+    # gets a hardlink to that PNG and a PDF page reusing the same XObject
+    first_with_key = {}
+    primary_of = {idx: first_with_key.setdefault(key, idx) for idx, _, _, key in jobs}
+    png_of = {idx: out_png for idx, _, out_png, _ in jobs}
+    unique_jobs = [job for job in jobs if primary_of[job[0]] == job[0]]
 
-    # Bundle PDF using Pillow
+    # Pages are appended to the PDF as they are rendered and then dropped;
+    # a row that failed to render is reported, not fatal
     pdf_path = os.path.join(out_dir, "labels_bundle.pdf")
-    if png_paths:
-        imgs = [Image.open(p).convert("RGB") for p in png_paths]
-        imgs[0].save(pdf_path, save_all=True, append_images=imgs[1:])
-    else:
-        # Create an empty stub if nothing parsed (helps with predictable output)
-        img = Image.new("RGB", (1000, 300), "white")
-        d = ImageDraw.Draw(img)
-        d.text((20, 120), "No labels generated from input.", font=_load_font(36), fill="black")
-        img.save(pdf_path, "PDF")
+    png_paths = []
+    errors = upc_errors
+    cache_hits = 0
+    shared = {}  # primary idx -> (add-page callable, XObject id, size) or error message
+    writer = VectorPdfWriter(pdf_path, FONTS.path) if vector else StreamingPdfWriter(pdf_path)
+    with writer as pdf:
+        rendered = _iter_rendered(format_choice, options, unique_jobs, workers=workers, pool_fonts=pool_fonts)
+        for done, (idx, rec, out_png, _) in enumerate(jobs):
+            progress.rendered(done, len(jobs))
+            primary = primary_of[idx]
+            if primary == idx:
+                _, page, error, cached = next(rendered)
+                cache_hits += cached
+                if error is not None:
+                    shared[idx] = error
+                elif isinstance(page, VectorPage):
+                    shared[idx] = (pdf.add_vector_page, pdf.add_vector_page(page), (page.width, page.height))
+                else:
+                    shared[idx] = (pdf.add_image_page, pdf.add_image_page(page), (page.width, page.height))
+            else:
+                if not isinstance(shared[primary], str):
+                    link_or_copy(png_of[primary], out_png)
+                    add_page, obj_id, size = shared[primary]
+                    add_page(None, obj_id, size)
+
+            if isinstance(shared[primary], str):
+                errors.append({"row": rec["row"], "SKU": rec["SKU"], "error": shared[primary]})
+                continue
+            png_paths.append(out_png)
+
+        if not png_paths:
+            # Create an empty stub if nothing parsed (helps with predictable output)
+            img = _new_canvas(1000, 300)
+            d = ImageDraw.Draw(img)
+            d.text((20, 120), "No labels generated from input.", font=_load_font(36), fill="black")
+            pdf.add_image_page(img)
+
+        progress.rendered(len(jobs), len(jobs))
+        page_count = pdf.page_count
+    # The PNG ZIP is built from png/ after the job (jobs.build_zip reports it) or streamed on download
+    progress.stage("pdf", pages=page_count)
+
+    render_cache = None
+    if use_cache and RENDER_CACHE is not None:
+        lookups = len(unique_jobs)
+        render_cache = {
+            "hits": cache_hits,
+            "misses": lookups - cache_hits,
+            "hit_ratio": round(cache_hits / lookups, 4) if lookups else 0.0,
+        }
+        if cache_hits < lookups:
+            render_cache["store"] = RENDER_CACHE.evict()
 
     return {
         "png_paths": png_paths,
         "pdf_path": pdf_path,
         "zip_path": os.path.join(out_dir, "labels_png.zip"),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "stats": {
+            "fonts": _font_stats_since(fonts_before, pool_fonts),
+            "render_cache": render_cache,
+            "dedup": {"labels": len(jobs), "unique": len(unique_jobs)},
+            "parse": parse_stats,
+        },
     }
 
+
+# Labels render_previews draws by default, and the sheet rows it reads to find them
+PREVIEW_LABELS = int(os.environ.get("BARCODE_PREVIEW_LABELS", "4"))
+PREVIEW_ROWS = 200
+
+
+def render_previews(
+    xls_or_csv_path: str,
+    format_choice: str,
+    include_price: bool,
+    price_value: Union[str, None],
+    out_dir: str,
+    hot_market: bool = False,
+    bda_format: bool = False,
+    round21_brand: bool = False,
+    pdf_backend: Union[str, None] = None,
+    use_cache: bool = True,
+    count: Union[int, None] = None
+) -> list[str]:
+    """
+    Render only the first few labels (PREVIEW_LABELS), reading just the head
+    of the input: the first PREVIEW_ROWS sheet rows, or the first page of a
+    Hunter Harms PDF, so the cost is the same for any PO size. The PNGs get the same names the
+    full bundle gives those records, and go through the render cache, so
+    the bundle picks them up instead of rendering them again.
+
+    Returns the PNG paths; rows that fail to render are left out (the full
+    bundle reports them).
+    """
+    count = PREVIEW_LABELS if count is None else count
+    format_choice = (format_choice or "").lower()
+    if count <= 0 or format_choice not in ("round21", "hunter_harms"):
+        return []
+
+    if format_choice == "round21":
+        records = _parse_round21(xls_or_csv_path, max_rows=PREVIEW_ROWS)
+    else:
+        records = [rec for page in _extract_hunter_harms(xls_or_csv_path, workers=1, max_pages=1)
+                   for rec in page.records]
+
+    options = _render_options(include_price, hot_market, bda_format, round21_brand, pdf_backend, use_cache)
+    png_dir = os.path.join(out_dir, "png")
+    os.makedirs(png_dir, exist_ok=True)
+    labelled = _check_upcs(format_choice, records)[0][:count]
+    jobs = [
+        (idx, rec, os.path.join(png_dir, fname), _render_key(format_choice, options, rec))
+        for (idx, rec), fname in zip(labelled, _label_filenames(format_choice, labelled))
+    ]
+    rendered = _render_chunk(format_choice, options, jobs)
+    return [out_png for (_, _, out_png, _), (_, _, error, _) in zip(jobs, rendered) if error is None]
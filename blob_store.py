@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import uuid
+
+
+# ---------------- Content-addressed blob store ----------------
+
+# Written into a linked tree when some of its files live in the blob store
+MANIFEST_NAME = "blobs.json"
+
+
+class BlobStore:
+    """
+    Files stored once under root/<aa>/<sha256> and shared by hardlinks, so
+    identical content in any number of trees takes the space of one copy.
+    A blob no tree links to any more (link count 1) is removed by prune().
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, src: str) -> str:
+        """Store a file's content (one read, hashed while copied) and return its digest"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+        h = hashlib.sha256()
+        try:
+            with open(src, "rb") as fin, open(tmp, "wb") as fout:
+                for chunk in iter(lambda: fin.read(1024 * 1024), b""):
+                    h.update(chunk)
+                    fout.write(chunk)
+            digest = h.hexdigest()
+            blob = self.path(digest)
+            if not os.path.exists(blob):
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                os.replace(tmp, blob)
+        finally:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+        return digest
+
+    def prune(self, digests) -> int:
+        """Remove the given blobs that no tree links to any more; returns how many went"""
+        removed = 0
+        for digest in set(digests):
+            blob = self.path(digest)
+            try:
+                if os.stat(blob).st_nlink == 1:
+                    os.remove(blob)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+def link_tree(src: str, dst: str, blobs: BlobStore, ignore: tuple = (".tmp",)) -> dict:
+    """
+    Recreate src at dst without copying file data: each file is hardlinked
+    from src, or, where src is on another filesystem, linked from its blob
+    in the store. Identical labels end up as one inode either way: jobs
+    link them from the same render cache entry, and blobs are keyed by
+    content. Files ending in any of ignore are skipped.
+    Blob-backed files are listed in dst/blobs.json (see manifest_digests).
+    Returns counts of linked and stored files.
+    """
+    manifest = {}
+    linked = 0
+    for dirpath, _, filenames in os.walk(src):
+        rel_dir = os.path.relpath(dirpath, src)
+        out_dir = os.path.normpath(os.path.join(dst, rel_dir))
+        os.makedirs(out_dir, exist_ok=True)
+        for fname in filenames:
+            if fname.endswith(ignore):
+                continue
+            src_path = os.path.join(dirpath, fname)
+            dst_path = os.path.join(out_dir, fname)
+            try:
+                os.link(src_path, dst_path)
+                linked += 1
+                continue
+            except OSError:
+                pass
+            digest = blobs.put(src_path)
+            os.link(blobs.path(digest), dst_path)
+            manifest[os.path.normpath(os.path.join(rel_dir, fname))] = digest
+    if manifest:
+        with open(os.path.join(dst, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+    return {"linked": linked, "stored": len(manifest)}
+
+
+def manifest_digests(tree: str) -> list:
+    """Blobs a linked tree uses (read before deleting the tree, then prune them)"""
+    try:
+        with open(os.path.join(tree, MANIFEST_NAME), "r") as f:
+            return list(json.load(f).values())
+    except (OSError, ValueError):
+        return []
@@ -1,5 +1,6 @@
 # Gunicorn configuration file
 import multiprocessing
+import os
 
 # Server socket
 bind = "127.0.0.1:8000"
@@ -9,6 +10,10 @@ backlog = 2048
 workers = multiprocessing.cpu_count() * 2 + 1
 worker_class = "sync"
 worker_connections = 1000
+# Job progress streams (/jobs/<job>/events) would hold a sync worker for
+# their whole length, so app.py only streams them under a worker class
+# that can serve other requests meanwhile
+os.environ.setdefault("BARCODE_EVENTS_STREAM", "1" if worker_class in ("gthread", "gevent", "eventlet") else "0")
 timeout = 30
 keepalive = 2
 
@@ -32,6 +37,25 @@ user = "www-data"
 group = "www-data"
 tmp_upload_dir = None
 
+# Server hooks
+def post_fork(server, worker):
+    # Resolve the label font and load every size once per worker, not per label
+    from barcode_gen import warm_fonts
+    stats = warm_fonts()
+    server.log.info("Worker %s fonts warmed: %s (%d sizes)", worker.pid, stats["path"], stats["sizes_cached"])
+
+def when_ready(server):
+    # Uploads are queued; a separate, separately sized pool renders them (BARCODE_JOB_WORKERS)
+    from jobs import JOB_WORKERS, spawn_job_runner
+    server.job_runner = spawn_job_runner(user=server.cfg.uid, group=server.cfg.gid)
+    server.log.info("Job runner %s started with %d workers", server.job_runner.pid, JOB_WORKERS)
+
+def on_exit(server):
+    runner = getattr(server, "job_runner", None)
+    if runner is not None:
+        runner.terminate()
+        runner.wait(timeout=15)
+
 # SSL (if needed)
 # keyfile = "/path/to/keyfile"
 # certfile = "/path/to/certfile"
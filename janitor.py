@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Union
+
+
+# ---------------- OUTPUT_DIR janitor ----------------
+
+# Same default as app.OUTPUT_DIR
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "barcode_app"))
+
+# Job folders are removed, least recently used first, while they add up to more than this (0: no budget)
+OUTPUT_MAX_BYTES = int(os.environ.get("BARCODE_OUTPUT_MAX_BYTES", str(10 * 1024 ** 3)))
+# ...or once they haven't been used for this long (0: no TTL)
+OUTPUT_TTL_HOURS = float(os.environ.get("BARCODE_OUTPUT_TTL_HOURS", "72"))
+# A job used more recently than this is never removed, whatever the budget
+OUTPUT_MIN_IDLE_MINUTES = float(os.environ.get("BARCODE_OUTPUT_MIN_IDLE_MINUTES", "30"))
+JANITOR_INTERVAL = float(os.environ.get("BARCODE_JANITOR_INTERVAL", "300"))
+
+JOB_PREFIX = "job_"
+STATS_NAME = "janitor.json"
+
+
+def touch(job_dir: str):
+    """Mark a job folder used now (its mtime is the janitor's LRU clock)"""
+    try:
+        os.utime(job_dir)
+    except OSError:
+        pass
+
+
+def _exclusive_bytes(path: str) -> int:
+    """
+    Bytes that removing the folder frees: files whose every link is inside
+    it. Labels linked from the render cache or a saved set don't count.
+    """
+    inodes = {}
+    for dirpath, _, filenames in os.walk(path):
+        for fname in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, fname))
+            except OSError:
+                continue
+            seen, nlink, size = inodes.get(st.st_ino, (0, st.st_nlink, st.st_size))
+            inodes[st.st_ino] = (seen + 1, nlink, size)
+    return sum(size for seen, nlink, size in inodes.values() if seen >= nlink)
+
+
+def load_stats(root: str = OUTPUT_DIR) -> dict:
+    """The janitor's last sweep and running totals (empty before the first sweep)"""
+    try:
+        with open(os.path.join(root, STATS_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class OutputJanitor:
+    """
+    Removes job folders from OUTPUT_DIR: any unused for longer than the
+    TTL, then the least recently used until the rest fit the byte budget.
+    Jobs named busy (queued, running, or still building a download) and
+    jobs used within the minimum idle time are always kept. Each sweep's
+    numbers and the running totals go to OUTPUT_DIR/janitor.json.
+    """
+
+    def __init__(self, root: str = OUTPUT_DIR, max_bytes: int = OUTPUT_MAX_BYTES,
+                 ttl_hours: float = OUTPUT_TTL_HOURS, min_idle_minutes: float = OUTPUT_MIN_IDLE_MINUTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl_hours * 3600
+        self.min_idle = min_idle_minutes * 60
+        # Folder sizes by name, reused while the folder's mtime is unchanged
+        self._sizes = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.ttl > 0
+
+    def _size(self, name: str, path: str, mtime_ns: int) -> int:
+        cached = self._sizes.get(name)
+        if cached is None or cached[0] != mtime_ns:
+            cached = self._sizes[name] = (mtime_ns, _exclusive_bytes(path))
+        return cached[1]
+
+    def sweep(self, busy: Union[set, None] = None) -> dict:
+        """Remove what the TTL and budget call for; returns this sweep's stats"""
+        start = time.perf_counter()
+        now = time.time()
+        busy = busy or set()
+        folders = []
+        for entry in os.scandir(self.root):
+            if not entry.name.startswith(JOB_PREFIX) or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+                folders.append((st.st_mtime, entry.name, entry.path, self._size(entry.name, entry.path, st.st_mtime_ns)))
+            except OSError:
+                continue
+        self._sizes = {name: self._sizes[name] for _, name, _, _ in folders if name in self._sizes}
+
+        total = sum(size for *_, size in folders)
+        removed = []
+        freed = expired = 0
+        # Least recently used first
+        for mtime, name, path, size in sorted(folders):
+            idle = now - mtime
+            if name in busy or idle < self.min_idle:
+                continue
+            is_expired = self.ttl > 0 and idle > self.ttl
+            if not is_expired and not (self.max_bytes > 0 and total > self.max_bytes):
+                # Every later folder is newer, so neither rule applies to it either
+                break
+            try:
+                # Measured again: the folder may have been used or linked from since it was sized
+                size = _exclusive_bytes(path)
+                shutil.rmtree(path)
+            except OSError:
+                continue
+            self._sizes.pop(name, None)
+            total -= size
+            freed += size
+            expired += is_expired
+            removed.append(name)
+
+        stats = {
+            "finished": datetime.utcnow().isoformat(),
+            "seconds": round(time.perf_counter() - start, 3),
+            "jobs": len(folders) - len(removed),
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "ttl_hours": self.ttl / 3600,
+            "removed_jobs": len(removed),
+            "removed_expired": expired,
+            "removed_over_budget": len(removed) - expired,
+            "freed_bytes": freed,
+            "removed": removed,
+        }
+        self._record(stats)
+        return stats
+
+    def _record(self, stats: dict):
+        totals = load_stats(self.root).get("totals", {})
+        summary = {
+            "last_sweep": stats,
+            "totals": {
+                "sweeps": totals.get("sweeps", 0) + 1,
+                "removed_jobs": totals.get("removed_jobs", 0) + stats["removed_jobs"],
+                "freed_bytes": totals.get("freed_bytes", 0) + stats["freed_bytes"],
+            },
+        }
+        path = os.path.join(self.root, STATS_NAME)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(summary, f)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+        finally:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+
+    def run(self, busy: Callable[[], set], removed: Callable[[list], None],
+            stop: threading.Event, interval: float = JANITOR_INTERVAL):
+        """
+        Sweep every interval until stop is set. busy() names the jobs to
+        keep; removed(names) is told which folders went (e.g. to drop their
+        queue rows). A failed sweep is retried on the next interval.
+        """
+        while not stop.is_set():
+            try:
+                stats = self.sweep(busy())
+                if stats["removed"]:
+                    removed(stats["removed"])
+            except Exception:
+                pass
+            stop.wait(interval)
@@ -0,0 +1,429 @@
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Union
+
+from barcode_gen import generate_labels_bundle, shutdown_render_pool, warm_fonts
+from janitor import OUTPUT_DIR, OutputJanitor
+from thumbnails import write_derivatives
+from zip_stream import png_entries, write_zip
+
+
+# ---------------- Durable job queue ----------------
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+# The queue lives next to the job folders
+JOB_DB_PATH = os.environ.get("BARCODE_JOB_DB", os.path.join(OUTPUT_DIR, "jobs.sqlite3"))
+JOB_WORKERS = int(os.environ.get("BARCODE_JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.environ.get("BARCODE_JOB_POLL_INTERVAL", "0.5"))
+# A job whose worker died this many times (e.g. killed for memory) fails instead of being queued again
+JOB_MAX_ATTEMPTS = int(os.environ.get("BARCODE_JOB_MAX_ATTEMPTS", "3"))
+# Labels listed in a finished job's result for previews
+JOB_SAMPLE_LABELS = 4
+
+# Job workers are started by a fork server (spawned where there is none),
+# never forked from JobWorkers: its janitor thread may be mid-sqlite or
+# mid-rmtree, and a fork would copy the locks it holds
+JOB_WORKER_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class JobQueue:
+    """
+    Label jobs in a local SQLite file, shared by the web workers (which
+    enqueue and poll) and the job workers (which claim and run them). Every
+    call opens its own short connection, so one instance can be used from
+    any thread or process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    filename TEXT,
+                    return_url TEXT,
+                    params TEXT NOT NULL,
+                    progress TEXT,
+                    previews TEXT,
+                    result TEXT,
+                    artifacts TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created TEXT NOT NULL,
+                    started TEXT,
+                    finished TEXT
+                )
+                """
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+            # Queues created before progress reporting / previews / artifacts / attempt counts
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column in ("progress", "previews", "artifacts"):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+            if "attempts" not in columns:
+                db.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def enqueue(self, job_id: str, params: dict, filename: Union[str, None] = None,
+                return_url: Union[str, None] = None, previews: Union[list, None] = None):
+        """previews: PNG names in the job's png/ folder already rendered (see render_previews)"""
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, filename, return_url, params, previews, created) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, filename, return_url, json.dumps(params), json.dumps(previews or []),
+                 datetime.utcnow().isoformat()),
+            )
+
+    def claim(self, worker: str) -> Union[dict, None]:
+        """Mark the oldest queued job running for this worker and return it"""
+        with self._connect() as db:
+            # IMMEDIATE takes the write lock up front, so two workers can't claim the same job
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    started = datetime.utcnow().isoformat()
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started = ?, attempts = attempts + 1 "
+                        "WHERE id = ?",
+                        (worker, started, row["id"]),
+                    )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = _job_dict(row)
+        job.update(status="running", worker=worker, started=started, attempts=job["attempts"] + 1)
+        return job
+
+    def set_progress(self, job_id: str, progress: dict):
+        """Latest progress event of a running job (see generate_labels_bundle)"""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+    def finish(self, job_id: str, result: dict, artifacts: Union[dict, None] = None):
+        self._close(job_id, "done", result=json.dumps(result), artifacts=json.dumps(artifacts or {}))
+
+    def fail(self, job_id: str, error: str):
+        self._close(job_id, "failed", error=error)
+
+    def _close(self, job_id: str, status: str, result: Union[str, None] = None,
+               error: Union[str, None] = None, artifacts: Union[str, None] = None):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, artifacts = ?, finished = ? WHERE id = ?",
+                (status, result, error, artifacts, datetime.utcnow().isoformat(), job_id),
+            )
+
+    def set_artifact(self, job_id: str, name: str, state: dict):
+        """State of one download artifact of a finished job ({"status": "pending" / "building" / "ready" / "failed", ...})"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT artifacts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                artifacts = json.loads(row["artifacts"]) if row is not None and row["artifacts"] else {}
+                artifacts[name] = state
+                db.execute("UPDATE jobs SET artifacts = ? WHERE id = ?", (json.dumps(artifacts), job_id))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def get(self, job_id: str) -> Union[dict, None]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row is not None else None
+
+    def position(self, job_id: str) -> int:
+        """Queued jobs ahead of this one"""
+        with self._connect() as db:
+            return db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created < "
+                "(SELECT created FROM jobs WHERE id = ?)",
+                (job_id,),
+            ).fetchone()[0]
+
+    def busy(self) -> set:
+        """Jobs whose folders are in use: queued, running, or done with a download still being built"""
+        busy = set()
+        with self._connect() as db:
+            for row in db.execute("SELECT id, status, artifacts FROM jobs WHERE status != 'failed'"):
+                if row["status"] != "done":
+                    busy.add(row["id"])
+                elif any(a.get("status") in ("pending", "building")
+                         for a in json.loads(row["artifacts"] or "{}").values()):
+                    busy.add(row["id"])
+        return busy
+
+    def delete(self, job_ids: list) -> int:
+        """Forget jobs whose folders were removed"""
+        with self._connect() as db:
+            return db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids]).rowcount
+
+    def requeue_orphans(self, max_attempts: Union[int, None] = None) -> int:
+        """
+        Put running jobs back in the queue if their worker process on this
+        host is gone. A job that has already taken max_attempts workers down
+        with it (JOB_MAX_ATTEMPTS) is failed instead, so one bad upload can't
+        crash every replacement worker in turn. Returns the jobs requeued.
+        """
+        max_attempts = JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        host = socket.gethostname()
+        orphans = []
+        with self._connect() as db:
+            for row in db.execute("SELECT id, worker, attempts FROM jobs WHERE status = 'running'"):
+                worker_host, _, pid = (row["worker"] or "").rpartition(":")
+                if worker_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                    orphans.append((row["id"], row["attempts"]))
+        requeued = 0
+        for job_id, attempts in orphans:
+            if attempts >= max_attempts:
+                self.fail(job_id, f"The job worker died {attempts} times running this job (out of memory?)")
+                continue
+            with self._connect() as db:
+                requeued += db.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, started = NULL WHERE id = ? AND status = 'running'",
+                    (job_id,),
+                ).rowcount
+        return requeued
+
+    def orphaned_artifacts(self, worker: str) -> list:
+        """
+        Done jobs whose artifact builds died with their worker on this host;
+        they are handed to this worker to build again.
+        """
+        host = socket.gethostname()
+        jobs = []
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for row in db.execute("SELECT * FROM jobs WHERE status = 'done' AND artifacts IS NOT NULL"):
+                    job = _job_dict(row)
+                    worker_host, _, pid = (job["worker"] or "").rpartition(":")
+                    unfinished = any(a.get("status") in ("pending", "building") for a in job["artifacts"].values())
+                    if unfinished and worker_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                        jobs.append(job)
+                for job in jobs:
+                    db.execute("UPDATE jobs SET worker = ? WHERE id = ?", (worker, job["id"]))
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return jobs
+
+
+def _job_dict(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["progress"] = json.loads(job["progress"]) if job["progress"] else None
+    job["previews"] = json.loads(job["previews"]) if job["previews"] else []
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["artifacts"] = json.loads(job["artifacts"]) if job["artifacts"] else {}
+    return job
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ---------------- Job workers ----------------
+
+def _drop_stale_previews(job: dict, png_paths: list):
+    """
+    Remove preview PNGs the job didn't produce (e.g. rows it rejected), so
+    png/ holds exactly the job's labels for the ZIP and saved sets
+    """
+    kept = {os.path.basename(p) for p in png_paths}
+    png_dir = os.path.join(job["params"]["out_dir"], "png")
+    for fname in job["previews"]:
+        if fname not in kept:
+            try:
+                os.remove(os.path.join(png_dir, fname))
+            except OSError:
+                pass
+
+
+def run_job(job: dict, queue: Union[JobQueue, None] = None) -> dict:
+    """Render one job; the result keeps what the status and results pages show"""
+    report = (lambda event: queue.set_progress(job["id"], event)) if queue is not None else None
+    results = generate_labels_bundle(**job["params"], progress=report)
+    _drop_stale_previews(job, results["png_paths"])
+    sample_pngs = [os.path.basename(p) for p in results["png_paths"][:JOB_SAMPLE_LABELS]]
+    # The results page shows these at preview size (the upload's previews usually have theirs already)
+    write_derivatives(job["params"]["out_dir"], sample_pngs, ("preview",))
+    return {
+        "count": len(results["png_paths"]),
+        "sample_pngs": sample_pngs,
+        "errors": results["errors"],
+        "stats": results["stats"],
+    }
+
+
+def build_zip(job: dict, queue: JobQueue):
+    """Write the job's PNG ZIP ahead of the first download (the PDF is written by the job itself)"""
+    out_dir = job["params"]["out_dir"]
+    queue.set_artifact(job["id"], "zip", {"status": "building"})
+    start = time.perf_counter()
+    try:
+        size = write_zip(png_entries(os.path.join(out_dir, "png")), os.path.join(out_dir, "labels_png.zip"))
+    except Exception as e:
+        queue.set_artifact(job["id"], "zip", {"status": "failed", "error": str(e)})
+    else:
+        queue.set_artifact(
+            job["id"], "zip", {"status": "ready", "bytes": size, "seconds": round(time.perf_counter() - start, 3)}
+        )
+        # Last progress event: only now can the ZIP be downloaded without waiting
+        queue.set_progress(job["id"], {"stage": "zip", "bytes": size})
+
+
+def _parent_alive(parent_pid: int) -> bool:
+    """Whether the process that started this one still runs (a fork server, not it, is our OS parent)"""
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        return parent.is_alive()
+    return os.getppid() == parent_pid
+
+
+def work(db_path: Union[str, None] = None, poll_interval: Union[float, None] = None,
+         parent_pid: Union[int, None] = None):
+    """
+    Claim and run jobs until the parent process goes away; a failed job is
+    recorded, never fatal to the worker. A finished job is marked done
+    straight away, and its ZIP is then built on a background thread while
+    the worker moves on to the next job.
+    """
+    # Terminated by JobWorkers: exit through the finally below, so the render pool goes too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    queue = JobQueue(db_path or JOB_DB_PATH)
+    poll_interval = JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    warm_fonts()
+    queue.requeue_orphans()
+    builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifacts")
+    for job in queue.orphaned_artifacts(worker):
+        builder.submit(build_zip, job, queue)
+    try:
+        while parent_pid is None or _parent_alive(parent_pid):
+            job = queue.claim(worker)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            try:
+                result = run_job(job, queue)
+            except Exception as e:
+                queue.fail(job["id"], str(e))
+                continue
+            pdf_path = os.path.join(job["params"]["out_dir"], "labels_bundle.pdf")
+            queue.finish(job["id"], result, artifacts={
+                "pdf": {"status": "ready", "bytes": os.path.getsize(pdf_path)},
+                "zip": {"status": "pending"},
+            })
+            builder.submit(build_zip, job, queue)
+    finally:
+        builder.shutdown(wait=True)
+        shutdown_render_pool()
+
+
+class JobWorkers:
+    """
+    A fixed number of job worker processes, sized apart from the web
+    workers (BARCODE_JOB_WORKERS). Dead workers are replaced; a job they
+    were running goes back in the queue. The OUTPUT_DIR janitor runs on a
+    thread alongside them.
+    """
+
+    def __init__(self, count: Union[int, None] = None, db_path: Union[str, None] = None,
+                 check_interval: float = 2.0):
+        self.count = JOB_WORKERS if count is None else count
+        self.db_path = db_path or JOB_DB_PATH
+        self.check_interval = check_interval
+
+    def _spawn(self) -> multiprocessing.Process:
+        # Not daemonic: a job may start its own render pool (BARCODE_RENDER_WORKERS)
+        proc = JOB_WORKER_CONTEXT.Process(
+            target=work, args=(self.db_path, None, os.getpid()), name="barcode-job-worker"
+        )
+        proc.start()
+        return proc
+
+    def run(self, parent_pid: Union[int, None] = None, timeout: float = 10.0):
+        """Run the workers until interrupted or, if given, the parent process exits"""
+        procs = [self._spawn() for _ in range(self.count)]
+        janitor = OutputJanitor()
+        stop = threading.Event()
+        if janitor.enabled:
+            queue = JobQueue(self.db_path)
+            threading.Thread(
+                target=janitor.run, args=(queue.busy, queue.delete, stop), name="janitor", daemon=True
+            ).start()
+        try:
+            while parent_pid is None or os.getppid() == parent_pid:
+                time.sleep(self.check_interval)
+                procs = [proc if proc.is_alive() else self._spawn() for proc in procs]
+        finally:
+            stop.set()
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                proc.join(timeout)
+
+
+def spawn_job_runner(user: Union[int, None] = None, group: Union[int, None] = None) -> subprocess.Popen:
+    """
+    Start the job workers as a separate process tied to this one (the
+    gunicorn master, or the dev server), so web workers never fork them.
+    Pass the web workers' uid/gid so job output is readable by them.
+    """
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__)],
+        env={**os.environ, "BARCODE_JOB_PARENT": str(os.getpid())},
+        user=user,
+        group=group,
+    )
+
+
+if __name__ == "__main__":
+    # Run the job workers on their own, e.g. as a separate service
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    parent = os.environ.get("BARCODE_JOB_PARENT")
+    try:
+        JobWorkers().run(parent_pid=int(parent) if parent else None)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+from typing import Union
+
+
+# ---------------- Saved label sets catalog ----------------
+
+# Same defaults as app.SAVED_LABELS_DIR
+SAVED_LABELS_DIR = os.environ.get(
+    "SAVED_LABELS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_labels")
+)
+SAVED_CATALOG_PATH = os.environ.get("BARCODE_SAVED_DB", os.path.join(SAVED_LABELS_DIR, "catalog.sqlite3"))
+
+SORT_ORDERS = {
+    "newest": "created DESC",
+    "oldest": "created ASC",
+    "name": "display_name COLLATE NOCASE ASC, created DESC",
+    "count": "count DESC, created DESC",
+}
+
+# Bump to rebuild existing catalogs from disk on the next start
+CATALOG_VERSION = 1
+
+
+class SavedLabelsCatalog:
+    """
+    Index of the saved label sets, so listing and opening them is a query
+    rather than a scan of every set's folder and metadata.json. The folders
+    stay the source of truth: save and delete update both, and rebuild()
+    recreates the index from disk (done automatically for a new catalog).
+    """
+
+    def __init__(self, path: str, root: str):
+        self.path = path
+        self.root = root
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS saved_sets (
+                    id TEXT PRIMARY KEY,
+                    display_name TEXT NOT NULL,
+                    original_filename TEXT,
+                    original_job TEXT,
+                    created TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    has_pdf INTEGER NOT NULL,
+                    thumbnail TEXT
+                )
+                """
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS saved_sets_created ON saved_sets (created)")
+            # The first process to open a new catalog fills it; the others wait on the lock
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if db.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+                    self._rebuild(db)
+                    db.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def add(self, metadata: dict, thumbnail: Union[str, None] = None):
+        """Index a set from its metadata.json contents (replacing any entry with the same id)"""
+        with self._connect() as db:
+            _insert(db, metadata, thumbnail)
+
+    def remove(self, saved_id: str) -> bool:
+        with self._connect() as db:
+            return db.execute("DELETE FROM saved_sets WHERE id = ?", (saved_id,)).rowcount > 0
+
+    def get(self, saved_id: str) -> Union[dict, None]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM saved_sets WHERE id = ?", (saved_id,)).fetchone()
+        return _set_dict(row) if row is not None else None
+
+    def list(self, page: int = 1, per_page: int = 50, sort: str = "newest") -> tuple:
+        """(sets on this 1-based page, total number of sets)"""
+        order = SORT_ORDERS.get(sort, SORT_ORDERS["newest"])
+        with self._connect() as db:
+            total = db.execute("SELECT COUNT(*) FROM saved_sets").fetchone()[0]
+            rows = db.execute(
+                f"SELECT * FROM saved_sets ORDER BY {order} LIMIT ? OFFSET ?",
+                (per_page, (max(page, 1) - 1) * per_page),
+            ).fetchall()
+        return [_set_dict(row) for row in rows], total
+
+    def rebuild(self) -> int:
+        """Re-read every saved set folder; returns the number of sets indexed"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                count = self._rebuild(db)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return count
+
+    def _rebuild(self, db: sqlite3.Connection) -> int:
+        db.execute("DELETE FROM saved_sets")
+        count = 0
+        for entry in os.scandir(self.root):
+            metadata_path = os.path.join(entry.path, "metadata.json")
+            if not entry.is_dir() or not os.path.exists(metadata_path):
+                continue
+            try:
+                with open(metadata_path, "r") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                continue
+            metadata.setdefault("id", entry.name)
+            _insert(db, metadata, first_png(os.path.join(entry.path, "png")))
+            count += 1
+        return count
+
+
+def first_png(png_dir: str) -> Union[str, None]:
+    """The set's thumbnail: its first PNG by name"""
+    try:
+        return min((f for f in os.listdir(png_dir) if f.endswith(".png")), default=None)
+    except OSError:
+        return None
+
+
+def _insert(db: sqlite3.Connection, metadata: dict, thumbnail: Union[str, None]):
+    db.execute(
+        "INSERT OR REPLACE INTO saved_sets "
+        "(id, display_name, original_filename, original_job, created, count, has_pdf, thumbnail) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            metadata["id"],
+            # Older saved sets have no display_name
+            metadata.get("display_name") or metadata.get("original_filename", "Unknown"),
+            metadata.get("original_filename"),
+            metadata.get("original_job"),
+            metadata["created"],
+            int(metadata.get("count", 0)),
+            int(bool(metadata.get("has_pdf"))),
+            thumbnail,
+        ),
+    )
+
+
+def _set_dict(row: sqlite3.Row) -> dict:
+    saved = dict(row)
+    saved["has_pdf"] = bool(saved["has_pdf"])
+    return saved
+
+
+if __name__ == "__main__":
+    # Re-index after saved sets were copied in or removed by hand
+    catalog = SavedLabelsCatalog(SAVED_CATALOG_PATH, SAVED_LABELS_DIR)
+    print(f"Indexed {catalog.rebuild()} saved label sets", file=sys.stderr)
@@ -0,0 +1,256 @@
+import bisect
+import ctypes
+import threading
+from typing import NamedTuple, Union
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_raw
+
+
+# ---------------- Table extraction from pdfium geometry ----------------
+
+# pdfium is not thread-safe: hold this around any use of a pdfium document
+PDFIUM_LOCK = threading.Lock()
+
+class PageGeometry(NamedTuple):
+    """
+    A page's text chars and ruling edges, in pdfplumber's top-down
+    coordinates. Built from pdfium, which loads a page an order of magnitude
+    faster than pdfminer.
+    """
+    bbox: tuple
+    chars: list
+    edges: list
+
+
+class TableLayout(NamedTuple):
+    """Where a fixed-layout table sits: its box and every column boundary x"""
+    bbox: tuple
+    columns: tuple
+
+
+def _edge(a: tuple, b: tuple) -> Union[dict, None]:
+    x0, x1 = sorted((a[0], b[0]))
+    top, bottom = sorted((a[1], b[1]))
+    orientation = "h" if top == bottom else "v" if x0 == x1 else None
+    if orientation is None:
+        return None
+    return {
+        "object_type": "line", "orientation": orientation,
+        "x0": x0, "x1": x1, "top": top, "bottom": bottom, "width": x1 - x0, "height": bottom - top,
+    }
+
+
+def page_geometry(page: pdfium.PdfPage) -> PageGeometry:
+    """Text chars (pdfminer-style loose boxes) and straight path segments of a page"""
+    width, height = page.get_size()
+
+    chars = []
+    textpage = page.get_textpage()
+    for i in range(textpage.count_chars()):
+        # Skip the spaces and line breaks pdfium infers; words are split at gaps instead (_cell_text)
+        if pdfium_raw.FPDFText_IsGenerated(textpage.raw, i):
+            continue
+        text = chr(pdfium_raw.FPDFText_GetUnicode(textpage.raw, i))
+        if text in ("\r", "\n"):
+            continue
+        left, bottom, right, top = textpage.get_charbox(i, loose=True)
+        chars.append({
+            "object_type": "char", "text": text, "upright": True,
+            "x0": left, "x1": right, "top": height - top, "bottom": height - bottom,
+            "doctop": height - top, "width": right - left, "height": top - bottom,
+        })
+
+    edges = []
+    x, y = ctypes.c_float(), ctypes.c_float()
+    for obj in page.get_objects(filter=[pdfium_raw.FPDF_PAGEOBJ_PATH], max_depth=1):
+        matrix = obj.get_matrix()
+        start = prev = None
+        for i in range(pdfium_raw.FPDFPath_CountSegments(obj.raw)):
+            segment = pdfium_raw.FPDFPath_GetPathSegment(obj.raw, i)
+            pdfium_raw.FPDFPathSegment_GetPoint(segment, x, y)
+            px, py = matrix.on_point(x.value, y.value)
+            point = (round(px, 3), round(height - py, 3))
+            kind = pdfium_raw.FPDFPathSegment_GetType(segment)
+            if kind == pdfium_raw.FPDF_SEGMENT_MOVETO:
+                start = point
+            elif kind == pdfium_raw.FPDF_SEGMENT_LINETO and prev is not None:
+                edges.append(_edge(prev, point))
+            prev = point
+            if pdfium_raw.FPDFPathSegment_GetClose(segment) and start is not None:
+                edges.append(_edge(point, start))
+                prev = start
+    return PageGeometry((0, 0, width, height), chars, [e for e in edges if e is not None])
+
+
+def _cluster(values, tolerance: float) -> list:
+    """Sorted values grouped where each is within tolerance of the previous one"""
+    groups = []
+    for value in sorted(set(values)):
+        if groups and value <= groups[-1][-1] + tolerance:
+            groups[-1].append(value)
+        else:
+            groups.append([value])
+    return groups
+
+
+def _spans(edges: list, lo: str, hi: str, tolerance: float) -> list:
+    """Merge collinear segments into (start, end) runs, bridging gaps up to tolerance"""
+    runs = []
+    for e in sorted(edges, key=lambda e: e[lo]):
+        if runs and e[lo] <= runs[-1][1] + tolerance:
+            runs[-1][1] = max(runs[-1][1], e[hi])
+        else:
+            runs.append([e[lo], e[hi]])
+    return runs
+
+
+def _covers(runs: list, a: float, b: float, tolerance: float) -> bool:
+    return any(start <= a + tolerance and end >= b - tolerance for start, end in runs)
+
+
+def _cell_text(chars: list, tolerance: float) -> str:
+    """
+    Text of a cell's chars: lines by top, words split at spaces and gaps
+    wider than tolerance, as pdfplumber's default extract_text joins them
+    """
+    words = []
+    for line in _group_by_top(chars, tolerance):
+        word = []
+        for char in sorted(line, key=lambda c: (c["x0"], c["x1"])):
+            if char["text"].isspace():
+                if word:
+                    words.append(word)
+                word = []
+                continue
+            if word and (char["x0"] < word[-1]["x0"] or char["x0"] > word[-1]["x1"] + tolerance
+                         or abs(char["top"] - word[-1]["top"]) > tolerance):
+                words.append(word)
+                word = []
+            word.append(char)
+        if word:
+            words.append(word)
+    lines = _group_by_top(
+        [{"top": min(c["top"] for c in word), "x0": word[0]["x0"], "text": "".join(c["text"] for c in word)}
+         for word in words],
+        tolerance,
+    )
+    return "\n".join(" ".join(word["text"] for word in line) for line in lines)
+
+
+def _group_by_top(objs: list, tolerance: float) -> list:
+    """objs grouped into lines by their top, top to bottom, each in its original order"""
+    line_of = {}
+    for i, group in enumerate(_cluster([o["top"] for o in objs], tolerance)):
+        for value in group:
+            line_of[value] = i
+    lines = [[] for _ in range(len(set(line_of.values())))]
+    for obj in objs:
+        lines[line_of[obj["top"]]].append(obj)
+    return lines
+
+
+def _h_rules(edges: list, tolerance: float) -> dict:
+    """Horizontal rules by y (collinear segments clustered and merged into runs)"""
+    h_edges = [e for e in edges if e["orientation"] == "h"]
+    rules = {}
+    for group in _cluster([e["top"] for e in h_edges], tolerance):
+        segs = [e for e in h_edges if group[0] <= e["top"] <= group[-1]]
+        rules[sum(group) / len(group)] = _spans(segs, "x0", "x1", tolerance)
+    return rules
+
+
+def learn_table_layout(geometry: PageGeometry, tolerance: float = 3) -> Union[TableLayout, None]:
+    """
+    The ruled table on a page (done once per document, on its first page):
+    its x-range is the widest horizontal rule, its top and bottom the
+    outermost rules spanning that width, and its columns the vertical rules
+    crossing its first row. None unless that makes a grid of at least two
+    rows and columns.
+    """
+    h_rules = _h_rules(geometry.edges, tolerance)
+    runs = [run for runs in h_rules.values() for run in runs]
+    if not runs:
+        return None
+    x0, x1 = max(runs, key=lambda run: run[1] - run[0])
+    borders = sorted(y for y, runs in h_rules.items() if _covers(runs, x0, x1, tolerance))
+    if len(borders) < 3:
+        return None
+    top, first_row = borders[0], min(y for y in h_rules if y > borders[0] + tolerance)
+    xs = [
+        e["x0"] for e in geometry.edges
+        if e["orientation"] == "v" and x0 - tolerance <= e["x0"] <= x1 + tolerance
+        and e["top"] <= top + tolerance and e["bottom"] >= first_row - tolerance
+    ]
+    columns = [sum(group) / len(group) for group in _cluster(xs, tolerance)]
+    if len(columns) < 3 or abs(columns[0] - x0) > tolerance or abs(columns[-1] - x1) > tolerance:
+        return None
+    return TableLayout((x0, top, x1, borders[-1]), tuple(columns))
+
+
+def extract_table(geometry: PageGeometry, layout: TableLayout, tolerance: float = 3) -> Union[list, None]:
+    """
+    Rows of the table in layout's x-range on this page, or None if it isn't
+    there. No table search: chars are assigned straight to the learned
+    column bounds and to row bands between the horizontal rules. Where the
+    page has no rule between two neighbouring cells they are one merged
+    cell, as pdfplumber reads them: the text goes to the first and the
+    others are None.
+    """
+    x0, _, x1, _ = layout.bbox
+    columns = layout.columns
+    h_rules = _h_rules(
+        [e for e in geometry.edges if e["x1"] >= x0 - tolerance and e["x0"] <= x1 + tolerance], tolerance
+    )
+    borders = sorted(y for y, runs in h_rules.items() if _covers(runs, x0, x1, tolerance))
+    if len(borders) < 2:
+        return None
+    top, bottom = borders[0], borders[-1]
+    rows = [y for y in sorted(h_rules) if top <= y <= bottom]
+
+    v_rules = []
+    for x in columns:
+        segs = [e for e in geometry.edges if e["orientation"] == "v" and abs(e["x0"] - x) <= tolerance]
+        v_rules.append(_spans(segs, "top", "bottom", tolerance))
+    # Same columns as the learned layout (each rule there, none elsewhere), or this page isn't the same table
+    if any(not _covers(runs, rows[0], rows[1], tolerance) for runs in v_rules):
+        return None
+    if any(
+        e["orientation"] == "v" and x0 + tolerance < e["x0"] < x1 - tolerance
+        and min(abs(e["x0"] - x) for x in columns) > tolerance
+        and e["top"] <= rows[0] + tolerance and e["bottom"] >= rows[1] - tolerance
+        for e in geometry.edges
+    ):
+        return None
+
+    # Each grid cell belongs to the merged cell of its top-left corner
+    owner = {}
+    for r, (a, b) in enumerate(zip(rows, rows[1:])):
+        for c, (left, right) in enumerate(zip(columns, columns[1:])):
+            if c > 0 and not _covers(v_rules[c], a, b, tolerance):
+                owner[r, c] = owner[r, c - 1]
+            elif r > 0 and not _covers(h_rules[a], left, right, tolerance):
+                owner[r, c] = owner[r - 1, c]
+            else:
+                owner[r, c] = (r, c)
+
+    chars = {}
+    for char in geometry.chars:
+        h_mid = (char["x0"] + char["x1"]) / 2
+        v_mid = (char["top"] + char["bottom"]) / 2
+        if not (x0 <= h_mid < x1 and top <= v_mid < bottom):
+            continue
+        r = bisect.bisect_right(rows, v_mid) - 1
+        c = min(max(bisect.bisect_right(columns, h_mid) - 1, 0), len(columns) - 2)
+        chars.setdefault(owner[r, c], []).append(char)
+
+    table = []
+    for r in range(len(rows) - 1):
+        cells = [
+            _cell_text(chars.get((r, c), []), tolerance) if owner[r, c] == (r, c) else None
+            for c in range(len(columns) - 1)
+        ]
+        # A row lying wholly inside taller cells above it isn't a row of its own
+        if any(cell is not None for cell in cells):
+            table.append(cells)
+    return table
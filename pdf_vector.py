@@ -0,0 +1,203 @@
+import io
+import zlib
+from typing import NamedTuple, Union
+
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+from pdf_writer import StreamingPdfWriter
+
+
+# ---------------- Vector label pages ----------------
+
+class VectorPage(NamedTuple):
+    """A label page as a PDF content stream plus the characters its text uses"""
+    width: int
+    height: int
+    content: bytes
+    chars: frozenset
+
+
+def _num(v: float) -> str:
+    return f"{v:.3f}".rstrip("0").rstrip(".")
+
+
+class PdfLabelCanvas:
+    """
+    Records label drawing as PDF operators, in the same pixel coordinates the
+    raster renderers use (1 px = 1 pt, origin top-left, flipped on output).
+    Text is written as 2-byte codes equal to the Unicode value; the font is
+    subset and mapped when the bundle is closed (see VectorPdfWriter).
+    """
+
+    def __init__(self, canvas_w: int, canvas_h: int):
+        self.width = canvas_w
+        self.height = canvas_h
+        self._ops = ["0 g"]
+        self._chars = set()
+
+    def text(self, xy, text: str, font):
+        if not text:
+            return
+        # Pillow anchors text at the ascender line ("la"); PDF draws on the baseline
+        ascent = font.getmetrics()[0]
+        codes = [ord(c) if ord(c) <= 0xFFFF else ord("?") for c in text]
+        self._chars.update(codes)
+        hex_codes = "".join(f"{c:04X}" for c in codes)
+        self._ops.append(
+            f"BT /F1 {_num(font.size)} Tf 1 0 0 1 {_num(xy[0])} {_num(self.height - xy[1] - ascent)} Tm <{hex_codes}> Tj ET"
+        )
+
+    def rectangle(self, box):
+        # Pillow rectangles include both end pixels
+        x0, y0, x1, y1 = box
+        self._ops.append(f"{_num(x0)} {_num(self.height - y1 - 1)} {_num(x1 - x0 + 1)} {_num(y1 - y0 + 1)} re f")
+
+    def bars(self, modules: str, x: float, top: float, module_w: float, bar_h: float):
+        """Fill each run of '1' modules as one rectangle (fractional widths allowed)"""
+        y = self.height - top - bar_h
+        i = 0
+        n = len(modules)
+        while i < n:
+            if modules[i] != "1":
+                i += 1
+                continue
+            start = i
+            while i < n and modules[i] == "1":
+                i += 1
+            self._ops.append(f"{_num(x + start * module_w)} {_num(y)} {_num((i - start) * module_w)} {_num(bar_h)} re f")
+
+    def page(self) -> VectorPage:
+        return VectorPage(self.width, self.height, "\n".join(self._ops).encode("ascii"), frozenset(self._chars))
+
+
+# ---------------- Vector PDF bundle ----------------
+
+class VectorPdfWriter(StreamingPdfWriter):
+    """
+    StreamingPdfWriter that also takes VectorPage pages. All pages share one
+    Type0 font; on close it is subset to the characters actually used and
+    embedded (FontFile2), with a CID-to-glyph map and a ToUnicode CMap.
+    """
+
+    def __init__(self, path: str, font_path: str, resolution: float = 72.0):
+        super().__init__(path, resolution=resolution)
+        self.font_path = font_path
+        self._font_id = None
+        self._chars = set()
+
+    def add_vector_page(self, page: Union[VectorPage, None] = None, form_id: Union[int, None] = None,
+                        size: Union[tuple, None] = None) -> int:
+        """
+        Add a page drawing a label as a form XObject: pass the page, or the id
+        returned for an earlier page (plus its size) to draw the same label again.
+        """
+        if form_id is None:
+            if self._font_id is None:
+                self._font_id = self._reserve()
+            self._chars.update(page.chars)
+            size = (page.width, page.height)
+            form_id = self.add_object(
+                f"/Type /XObject /Subtype /Form /BBox [0 0 {page.width} {page.height}] "
+                f"/Resources << /Font << /F1 {self._font_id} 0 R >> >> /Filter /FlateDecode",
+                zlib.compress(page.content),
+            )
+        scale = 72.0 / self.resolution
+        self.add_page(
+            size[0] * scale, size[1] * scale,
+            f"q {_num(scale)} 0 0 {_num(scale)} 0 0 cm /Fm0 Do Q".encode("ascii"),
+            f"/XObject << /Fm0 {form_id} 0 R >>",
+        )
+        return form_id
+
+    def close(self):
+        if not self._fp.closed and self._font_id is not None:
+            self._write_font()
+        super().close()
+
+    def _write_font(self):
+        font = TTFont(self.font_path, fontNumber=0, lazy=False, recalcTimestamp=False)
+        options = subset.Options()
+        options.notdef_outline = True
+        options.name_IDs = ["*"]
+        options.layout_features = []
+        options.drop_tables += ["FFTM"]
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=self._chars)
+        subsetter.subset(font)
+
+        cmap = font.getBestCmap() or {}
+        units = font["head"].unitsPerEm
+        hmtx = font["hmtx"]
+        glyph_ids = {}
+        widths = {}
+        for code in sorted(self._chars):
+            name = cmap.get(code, ".notdef")
+            glyph_ids[code] = font.getGlyphID(name)
+            widths[code] = round(hmtx[name][0] * 1000 / units)
+
+        buf = io.BytesIO()
+        font.save(buf)
+        font_file = buf.getvalue()
+
+        base_name = "LBLSUB+" + "".join(
+            c for c in (font["name"].getDebugName(6) or "LabelFont") if c.isalnum() or c == "-"
+        )
+        head = font["head"]
+        hhea = font["hhea"]
+        os2 = font["OS/2"] if "OS/2" in font else None
+        to_pdf = 1000 / units
+        ascent = round(hhea.ascent * to_pdf)
+        descent = round(hhea.descent * to_pdf)
+        cap_height = round(getattr(os2, "sCapHeight", 0) * to_pdf) if os2 else ascent
+
+        font_file_id = self.add_object(f"/Length1 {len(font_file)} /Filter /FlateDecode", zlib.compress(font_file))
+        descriptor_id = self.add_object(
+            f"<< /Type /FontDescriptor /FontName /{base_name} /Flags 32 "
+            f"/FontBBox [{round(head.xMin * to_pdf)} {round(head.yMin * to_pdf)} "
+            f"{round(head.xMax * to_pdf)} {round(head.yMax * to_pdf)}] "
+            f"/ItalicAngle 0 /Ascent {ascent} /Descent {descent} /CapHeight {cap_height} "
+            f"/StemV 80 /FontFile2 {font_file_id} 0 R >>"
+        )
+
+        max_code = max(self._chars) if self._chars else 0
+        gid_map = bytearray(2 * (max_code + 1))
+        for code, gid in glyph_ids.items():
+            gid_map[2 * code:2 * code + 2] = gid.to_bytes(2, "big")
+        gid_map_id = self.add_object("/Filter /FlateDecode", zlib.compress(bytes(gid_map)))
+
+        w_array = " ".join(f"{code} [{width}]" for code, width in widths.items())
+        cid_font_id = self.add_object(
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base_name} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {descriptor_id} 0 R /DW 1000 /W [{w_array}] /CIDToGIDMap {gid_map_id} 0 R >>"
+        )
+        to_unicode_id = self.add_object("/Filter /FlateDecode", zlib.compress(_to_unicode_cmap(self._chars)))
+        self._write_obj(
+            self._font_id,
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{base_name} /Encoding /Identity-H "
+            f"/DescendantFonts [{cid_font_id} 0 R] /ToUnicode {to_unicode_id} 0 R >>",
+        )
+
+
+def _to_unicode_cmap(chars: Union[set, frozenset]) -> bytes:
+    """Codes are Unicode values already, so every mapping is the identity"""
+    codes = sorted(chars)
+    lines = [
+        "/CIDInit /ProcSet findresource begin",
+        "12 dict begin",
+        "begincmap",
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        "/CMapName /Adobe-Identity-UCS def",
+        "/CMapType 2 def",
+        "1 begincodespacerange",
+        "<0000> <FFFF>",
+        "endcodespacerange",
+    ]
+    for i in range(0, len(codes), 100):
+        block = codes[i:i + 100]
+        lines.append(f"{len(block)} beginbfchar")
+        lines.extend(f"<{c:04X}> <{c:04X}>" for c in block)
+        lines.append("endbfchar")
+    lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+    return "\n".join(lines).encode("ascii")
@@ -0,0 +1,157 @@
+import io
+import math
+import os
+import uuid
+import zlib
+from typing import NamedTuple, Union
+
+from PIL import Image, features
+
+
+# ---------------- Incremental PDF writer ----------------
+
+class EncodedImage(NamedTuple):
+    """A compressed PDF image stream; small enough to pass between processes"""
+    width: int
+    height: int
+    color_space: str
+    bits: int
+    filter: str
+    decode_parms: str
+    data: bytes
+
+
+def encode_image(img: Image.Image) -> EncodedImage:
+    """
+    Compress an image for a PDF image XObject:
+    - mode "1": CCITT G4 when Pillow has libtiff, otherwise Flate of the packed bits
+    - mode "L" / "RGB": Flate (lossless, unlike Pillow's JPEG pages)
+    """
+    width, height = img.size
+    if img.mode == "1":
+        if features.check("libtiff"):
+            op = io.BytesIO()
+            # A single-strip group4 TIFF is the 8-byte header followed by the G4 data
+            img.save(op, "TIFF", compression="group4", strip_size=math.ceil(width / 8) * height)
+            return EncodedImage(
+                width, height, "DeviceGray", 1, "CCITTFaxDecode",
+                f"<< /K -1 /BlackIs1 true /Columns {width} /Rows {height} >>",
+                op.getvalue()[8:],
+            )
+        # Pillow packs mode "1" rows with 1 = white, which is what DeviceGray expects
+        return EncodedImage(width, height, "DeviceGray", 1, "FlateDecode", "", zlib.compress(img.tobytes(), 6))
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    color_space = "DeviceGray" if img.mode == "L" else "DeviceRGB"
+    return EncodedImage(width, height, color_space, 8, "FlateDecode", "", zlib.compress(img.tobytes(), 6))
+
+
+class StreamingPdfWriter:
+    """
+    Writes a PDF one page at a time: every object goes to disk as soon as it
+    is added, and only byte offsets are kept, so memory stays flat whatever
+    the page count. Use as a context manager or call close().
+
+    Pages go to a temp file beside path, moved into place by close(), so a
+    crashed job never leaves a PDF without its xref at path; leaving the
+    context with an exception removes the temp file.
+    """
+
+    def __init__(self, path: str, resolution: float = 72.0):
+        self.path = path
+        self.resolution = resolution
+        self._tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        self._fp = open(self._tmp, "wb")
+        self._offsets = []
+        self._page_ids = []
+        self._fp.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._pages_id = self._reserve()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.close()
+        finally:
+            self._fp.close()
+            if os.path.lexists(self._tmp):
+                os.remove(self._tmp)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _reserve(self) -> int:
+        self._offsets.append(None)
+        return len(self._offsets)
+
+    def _write_obj(self, obj_id: int, body: str, stream: Union[bytes, None] = None):
+        self._offsets[obj_id - 1] = self._fp.tell()
+        self._fp.write(f"{obj_id} 0 obj\n".encode("ascii"))
+        if stream is None:
+            self._fp.write(body.encode("latin-1"))
+        else:
+            self._fp.write(f"<< {body} /Length {len(stream)} >>\nstream\n".encode("latin-1"))
+            self._fp.write(stream)
+            self._fp.write(b"\nendstream")
+        self._fp.write(b"\nendobj\n")
+
+    def add_object(self, body: str, stream: Union[bytes, None] = None) -> int:
+        """Write a raw object (dictionary source or stream) and return its id"""
+        obj_id = self._reserve()
+        self._write_obj(obj_id, body, stream)
+        return obj_id
+
+    def add_image(self, img: Union[Image.Image, EncodedImage]) -> int:
+        """Write an image XObject; the returned id can be drawn on any number of pages"""
+        enc = img if isinstance(img, EncodedImage) else encode_image(img)
+        body = (
+            f"/Type /XObject /Subtype /Image /Width {enc.width} /Height {enc.height} "
+            f"/ColorSpace /{enc.color_space} /BitsPerComponent {enc.bits} /Filter /{enc.filter}"
+        )
+        if enc.decode_parms:
+            body += f" /DecodeParms {enc.decode_parms}"
+        return self.add_object(body, enc.data)
+
+    def add_page(self, width: float, height: float, content: bytes, resources: str = ""):
+        """Add a page of the given size in points with a raw content stream"""
+        content_id = self.add_object("/Filter /FlateDecode", zlib.compress(content))
+        self.add_object(
+            f"<< /Type /Page /Parent {self._pages_id} 0 R /MediaBox [0 0 {width:g} {height:g}] "
+            f"/Resources << {resources} >> /Contents {content_id} 0 R >>"
+        )
+        self._page_ids.append(len(self._offsets))
+
+    def add_image_page(self, img: Union[Image.Image, EncodedImage, None] = None, image_id: Union[int, None] = None,
+                       size: Union[tuple, None] = None):
+        """
+        Add a page showing one full-page image: pass the image, or the id of an
+        image already written with add_image (plus its pixel size).
+        """
+        if image_id is None:
+            enc = img if isinstance(img, EncodedImage) else encode_image(img)
+            image_id = self.add_image(enc)
+            size = (enc.width, enc.height)
+        width = size[0] * 72.0 / self.resolution
+        height = size[1] * 72.0 / self.resolution
+        content = f"q {width:g} 0 0 {height:g} 0 0 cm /Im0 Do Q".encode("ascii")
+        self.add_page(width, height, content, f"/XObject << /Im0 {image_id} 0 R >>")
+        return image_id
+
+    def close(self):
+        if self._fp.closed:
+            return
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_obj(self._pages_id, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        catalog_id = self.add_object(f"<< /Type /Catalog /Pages {self._pages_id} 0 R >>")
+
+        xref_at = self._fp.tell()
+        lines = [f"xref\n0 {len(self._offsets) + 1}\n", "0000000000 65535 f \n"]
+        lines += [f"{offset:010d} 00000 n \n" for offset in self._offsets]
+        lines.append(f"trailer\n<< /Size {len(self._offsets) + 1} /Root {catalog_id} 0 R >>\n")
+        lines.append(f"startxref\n{xref_at}\n%%EOF\n")
+        self._fp.write("".join(lines).encode("ascii"))
+        self._fp.close()
+        os.replace(self._tmp, self.path)
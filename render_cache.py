@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Union
+
+from pdf_vector import VectorPage
+from pdf_writer import EncodedImage
+
+
+# ---------------- Content-addressed render cache ----------------
+
+def _same_file(src: str, dst: str) -> bool:
+    try:
+        return os.path.samefile(src, dst)
+    except OSError:
+        return False
+
+
+def link_or_copy(src: str, dst: str):
+    """
+    Hardlink when src and dst share a filesystem, copy otherwise. If dst
+    already is src (same path, or a link to it) it is left alone: removing
+    it first would delete the only copy.
+    """
+    if os.path.lexists(dst):
+        if _same_file(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _dump_page(page: Union[EncodedImage, VectorPage]) -> bytes:
+    """Cached PDF page: one JSON header line, then the raw stream bytes"""
+    if isinstance(page, VectorPage):
+        header = {"kind": "vector", "width": page.width, "height": page.height, "chars": sorted(page.chars)}
+        data = page.content
+    else:
+        header = {"kind": "image", **page._asdict()}
+        data = header.pop("data")
+    return json.dumps(header).encode("utf-8") + b"\n" + data
+
+
+def _load_page(raw: bytes) -> Union[EncodedImage, VectorPage]:
+    header, data = raw.split(b"\n", 1)
+    header = json.loads(header)
+    if header.pop("kind") == "vector":
+        return VectorPage(header["width"], header["height"], data, frozenset(header["chars"]))
+    return EncodedImage(data=data, **header)
+
+
+class RenderCache:
+    """
+    Disk cache of rendered labels shared by every job and process on the box.
+    Each entry is the label PNG plus its PDF page, stored under the hash of
+    everything that determines the output (see key()). Entries are written
+    atomically, hits are hardlinked into the job, and the least recently
+    used entries are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str) -> tuple:
+        shard = os.path.join(self.root, key[:2])
+        return os.path.join(shard, f"{key}.png"), os.path.join(shard, f"{key}.page")
+
+    def fetch(self, key: str, out_png: str) -> Union[EncodedImage, VectorPage, None]:
+        """Place the cached PNG at out_png and return its PDF page, or None on a miss"""
+        png_path, page_path = self._paths(key)
+        try:
+            with open(page_path, "rb") as f:
+                page = _load_page(f.read())
+            link_or_copy(png_path, out_png)
+            # The .page file's mtime is the recency the evictor sorts on. Never the
+            # PNG's: that inode is shared with job and saved-set files, whose
+            # mtime is their Last-Modified / ETag
+            os.utime(page_path)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return page
+
+    def store(self, key: str, out_png: str, page: Union[EncodedImage, VectorPage]):
+        png_path, page_path = self._paths(key)
+        os.makedirs(os.path.dirname(png_path), exist_ok=True)
+        tmp = f"{png_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_dump_page(page))
+            os.replace(tmp, page_path)
+            link_or_copy(out_png, tmp)
+            os.replace(tmp, png_path)
+        except OSError:
+            # A cache that can't be written must never fail the render
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+
+    def evict(self) -> dict:
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self._evict_lock:
+            entries = []
+            total = 0
+            for shard in os.scandir(self.root):
+                if not shard.is_dir():
+                    continue
+                sizes = {}
+                for entry in os.scandir(shard.path):
+                    key, ext = os.path.splitext(entry.name)
+                    if ext not in (".png", ".page"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    size, mtime = sizes.get(key, (0, 0.0))
+                    sizes[key] = (size + st.st_size, st.st_mtime if ext == ".page" else mtime)
+                    total += st.st_size
+                entries.extend((mtime, size, key) for key, (size, mtime) in sizes.items())
+
+            removed = freed = 0
+            if total > self.max_bytes:
+                for mtime, size, key in sorted(entries):
+                    if total - freed <= self.max_bytes:
+                        break
+                    for path in self._paths(key):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    removed += 1
+                    freed += size
+            return {"entries": len(entries) - removed, "bytes": total - freed, "evicted": removed, "freed_bytes": freed}
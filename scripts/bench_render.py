@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Render Microbenchmark
+Measures labels/sec for UPC bar drawing: the old per-module draw.rectangle
+loop against merged bar runs, plus full render_label throughput.
+
+Usage: python scripts/bench_render.py [iterations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+import barcode_gen  # noqa: E402
+
+UPCS = ["81017075937", "81017075938", "81017075939", "81017075940", "81017075941"]
+CANVAS_W, CANVAS_H, MARGIN = 1400, 900, 80
+BAR_TOP, BAR_BOTTOM = 370, 680
+
+
+def _geometry(pattern):
+    modules = len(pattern)
+    module_w = int(max(1, (CANVAS_W - 2 * MARGIN) // modules))
+    x0 = (CANVAS_W - module_w * modules) // 2
+    guard_extra = int((BAR_BOTTOM - BAR_TOP) * 0.12)
+    return modules, module_w, x0, guard_extra
+
+
+def bars_per_module(img, pattern):
+    """The previous approach: one draw.rectangle per '1' module"""
+    draw = ImageDraw.Draw(img)
+    modules, module_w, x0, guard_extra = _geometry(pattern)
+    for i, bit in enumerate(pattern):
+        if bit == '1':
+            is_guard = (i < 3) or (45 <= i < 50) or (modules - 3 <= i < modules)
+            bottom = BAR_BOTTOM + (guard_extra if is_guard else 0)
+            draw.rectangle([x0 + i * module_w, BAR_TOP, x0 + (i + 1) * module_w - 1, bottom], fill="black")
+
+
+def bars_merged_runs(img, pattern):
+    _, module_w, x0, guard_extra = _geometry(pattern)
+    barcode_gen._draw_upc_bars(ImageDraw.Draw(img), pattern, x0, module_w, BAR_TOP, BAR_BOTTOM, guard_extra)
+
+
+def _rate(fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    patterns = [
+        barcode_gen.encode_upc(u + barcode_gen.upc_check_digit(u)) for u in UPCS
+    ]
+
+    # Same output from both bar drawing paths
+    for pattern in patterns:
+        a = Image.new("RGB", (CANVAS_W, CANVAS_H), "white")
+        b = Image.new("RGB", (CANVAS_W, CANVAS_H), "white")
+        bars_per_module(a, pattern)
+        bars_merged_runs(b, pattern)
+        assert a.tobytes() == b.tobytes(), "bar raster output differs"
+
+    def run_bars(draw_fn):
+        # Canvas allocation is left out so only bar drawing is timed
+        img = Image.new("RGB", (CANVAS_W, CANVAS_H), "white")
+
+        def step(i):
+            draw_fn(img, patterns[i % len(patterns)])
+        return step
+
+    before = _rate(run_bars(bars_per_module), iterations)
+    after = _rate(run_bars(bars_merged_runs), iterations)
+    print(f"Barcode bars, per-module rectangles: {before:8.1f} labels/sec")
+    print(f"Barcode bars, merged runs:           {after:8.1f} labels/sec ({after / before:.2f}x)")
+
+    barcode_gen.warm_fonts()
+    with tempfile.TemporaryDirectory() as tmp:
+        def full(i):
+            barcode_gen.render_label(
+                title="With Love LA Tee",
+                sku="WNBA-1-0110-001-SM",
+                color="Black",
+                upc_input=UPCS[i % len(UPCS)],
+                out_path=os.path.join(tmp, f"{i % 10}.png"),
+                include_price=True,
+                price_value="39.99",
+            )
+        full_iterations = max(1, iterations // 5)
+        print(f"Full render_label (incl. PNG write):  {_rate(full, full_iterations):8.1f} labels/sec")
+
+
+if __name__ == "__main__":
+    main()
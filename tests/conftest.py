@@ -0,0 +1,32 @@
+import csv
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Modules live at the repo root; the render cache and storage folders are read
+# at import time, so point them somewhere disposable before anything imports them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_SCRATCH = tempfile.mkdtemp(prefix="barcode-tests-")
+os.environ.setdefault("BARCODE_RENDER_CACHE_DIR", os.path.join(_SCRATCH, "render_cache"))
+os.environ.setdefault("OUTPUT_DIR", os.path.join(_SCRATCH, "output"))
+os.environ.setdefault("SAVED_LABELS_DIR", os.path.join(_SCRATCH, "saved_labels"))
+os.environ.setdefault("BARCODE_RENDER_WORKERS", "1")
+
+ROUND21_HEADER_ROWS = 11  # label rows start at sheet row 12
+
+
+@pytest.fixture
+def round21_csv(tmp_path):
+    """Write Round21 label rows ({column index: value}) below the header block; returns the path"""
+    def write(rows, name="round21.csv"):
+        path = tmp_path / name
+        with open(path, "w", newline="") as f:
+            out = csv.writer(f)
+            for i in range(ROUND21_HEADER_ROWS):
+                out.writerow([f"header {i}"] + [""] * 11)
+            for row in rows:
+                out.writerow([row.get(c, "") for c in range(12)])
+        return str(path)
+    return write
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from barcode_gen import CODE128_PATTERNS, encode_code128, generate_code128_barcode
+
+SWITCH_TO = {99: "C", 100: "B", 101: "A"}
+
+
+def decode_code128(modules: str) -> str:
+    """Text of a Code 128 module pattern, checking start, checksum and stop"""
+    assert modules.endswith(CODE128_PATTERNS[106])
+    body = modules[:-len(CODE128_PATTERNS[106])]
+    assert len(body) % 11 == 0
+    values = [CODE128_PATTERNS.index(body[i:i + 11]) for i in range(0, len(body), 11)]
+    start, *data, check = values
+    assert check == (start + sum(pos * value for pos, value in enumerate(data, 1))) % 103
+
+    code_set = {103: "A", 104: "B", 105: "C"}[start]
+    text = []
+    shifted = False
+    for value in data:
+        current = ("B" if code_set == "A" else "A") if shifted else code_set
+        shifted = False
+        if current == "C" and value < 100:
+            text.append(f"{value:02d}")
+        elif current != "C" and value < 96:
+            text.append(chr(value - 64) if current == "A" and value >= 64 else chr(value + 32))
+        elif value == 98 and current != "C":
+            shifted = True
+        else:
+            code_set = SWITCH_TO[value]
+    return "".join(text)
+
+
+@pytest.mark.parametrize("data", [
+    "ABC-123-XL",
+    "12345678",
+    "1234567",
+    "12",
+    "abc123456def",
+    "SKU 0042/M",
+    "A\tb",
+    "a\nB\nc",
+    "ab\ncd",  # one control character shifted into B
+    "~`{|}",
+])
+def test_encode_round_trip(data):
+    assert decode_code128(encode_code128(data)) == data
+
+
+def test_digit_runs_use_code_set_c():
+    # Start C + 4 pairs + checksum, then the 13-module stop
+    assert len(encode_code128("12345678")) == 11 * 6 + 13
+
+
+@pytest.mark.parametrize("data", ["", "café"])
+def test_encode_rejects_what_code128_cannot_carry(data):
+    with pytest.raises(ValueError):
+        encode_code128(data)
+
+
+def test_image_bars_match_the_modules():
+    modules = encode_code128("HH-2041_XL")
+    img = generate_code128_barcode("HH-2041_XL", width=1200, height=80)
+    assert img.width == 1200
+    x0, module_w = img.info["code128"][1:3]
+    module_px = round(module_w * img.width)
+    start = round(x0 * img.width)
+
+    row = np.asarray(img.convert("L"))[img.height // 2]
+    bars = row[start:start + len(modules) * module_px] < 128
+    assert "".join("1" if bar else "0" for bar in bars[::module_px]) == modules
+    assert (bars.reshape(-1, module_px) == bars[::module_px, None]).all()
+    # Quiet zones either side
+    assert (row[:start] >= 128).all()
+    assert (row[start + len(modules) * module_px:] >= 128).all()
+
+
+def test_symbol_wider_than_the_slot_is_an_error():
+    with pytest.raises(ValueError, match="too long"):
+        generate_code128_barcode("X" * 120, width=1200, height=80)
@@ -0,0 +1,92 @@
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from jobs import JobQueue
+
+HOST = socket.gethostname()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+@pytest.fixture(scope="module")
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_claim_takes_the_oldest_queued_job(queue):
+    queue.enqueue("job_a", {"out_dir": "a"})
+    queue.enqueue("job_b", {"out_dir": "b"})
+    assert queue.position("job_b") == 1
+
+    job = queue.claim("w:1")
+    assert (job["id"], job["status"], job["attempts"], job["params"]) == ("job_a", "running", 1, {"out_dir": "a"})
+    assert queue.get("job_a")["attempts"] == 1
+    assert queue.claim("w:2")["id"] == "job_b"
+    assert queue.claim("w:3") is None
+
+
+def test_orphans_of_dead_workers_on_this_host_are_requeued(queue, dead_pid):
+    for job_id, worker in (("job_dead", f"{HOST}:{dead_pid}"), ("job_alive", f"{HOST}:{os.getpid()}"),
+                           ("job_elsewhere", f"other-host:{dead_pid}")):
+        queue.enqueue(job_id, {})
+        queue.claim(worker)
+
+    assert queue.requeue_orphans() == 1
+    assert queue.get("job_dead")["status"] == "queued"
+    assert queue.get("job_dead")["worker"] is None
+    assert queue.get("job_alive")["status"] == "running"
+    assert queue.get("job_elsewhere")["status"] == "running"
+    assert queue.requeue_orphans() == 0
+
+
+def test_job_that_keeps_killing_its_worker_fails(queue, dead_pid):
+    queue.enqueue("job_oom", {})
+    for attempt in (1, 2):
+        assert queue.claim(f"{HOST}:{dead_pid}")["attempts"] == attempt
+        assert queue.requeue_orphans(max_attempts=3) == 1
+    queue.claim(f"{HOST}:{dead_pid}")
+    assert queue.requeue_orphans(max_attempts=3) == 0
+
+    job = queue.get("job_oom")
+    assert job["status"] == "failed"
+    assert job["attempts"] == 3
+    assert "died 3 times" in job["error"]
+    assert queue.claim("w:1") is None
+
+
+def test_busy_until_downloads_are_built(queue):
+    for job_id in ("job_running", "job_building", "job_done", "job_failed"):
+        queue.enqueue(job_id, {})
+        queue.claim("w:1")
+    queue.finish("job_building", {}, {"zip": {"status": "building"}})
+    queue.finish("job_done", {}, {"zip": {"status": "ready"}})
+    queue.fail("job_failed", "boom")
+    queue.enqueue("job_queued", {})
+    assert queue.busy() == {"job_queued", "job_running", "job_building"}
+
+
+def test_old_queue_gets_the_attempts_column(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, return_url TEXT, "
+        "params TEXT NOT NULL, result TEXT, error TEXT, worker TEXT, created TEXT NOT NULL, "
+        "started TEXT, finished TEXT)"
+    )
+    db.execute("INSERT INTO jobs (id, status, params, created) VALUES ('job_old', 'queued', '{}', '2024-01-01')")
+    db.commit()
+    db.close()
+
+    queue = JobQueue(path)
+    assert queue.get("job_old")["attempts"] == 0
+    assert queue.claim("w:1")["attempts"] == 1
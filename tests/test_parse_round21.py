@@ -0,0 +1,77 @@
+import math
+
+import openpyxl
+
+from barcode_gen import _parse_round21, _read_round21_xlsx
+from conftest import ROUND21_HEADER_ROWS
+
+# Columns: A SKU, C Title, H UPC, I Color, K Price
+
+
+def _write_xlsx(path, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for i in range(ROUND21_HEADER_ROWS):
+        ws.append([f"header {i}"])
+    for row in rows:
+        ws.append([row.get(c) for c in range(12)])
+    wb.save(path)
+    return str(path)
+
+
+def test_xlsx_numbers_are_ints_and_text_keeps_leading_zeros(tmp_path):
+    path = _write_xlsx(tmp_path / "r.xlsx", [
+        {0: 1001, 2: "Tee", 7: 36000291452, 8: "Black", 10: 12.5},
+        {0: "0042-A", 2: "Hoodie", 7: "036000291452", 8: 7, 10: 20},
+    ])
+    first, second = _parse_round21(path)
+    assert first["SKU"] == "1001"
+    assert first["UPC"] == "36000291452"
+    assert first["Price"] == "12.5"
+    assert second["SKU"] == "0042-A"
+    assert second["UPC"] == "036000291452"
+    assert second["Color"] == "7"
+    assert second["Price"] == "20"
+
+
+def test_xlsx_blanks_and_na_strings_are_missing(tmp_path):
+    path = _write_xlsx(tmp_path / "r.xlsx", [
+        {0: "A-1", 2: "N/A", 7: "036000291452", 8: "NULL"},
+        {0: "A-2", 2: "", 7: "#N/A"},
+    ])
+    frame = _read_round21_xlsx(path, ROUND21_HEADER_ROWS)
+    assert frame.dtypes.eq(object).all()
+    assert math.isnan(frame.loc[ROUND21_HEADER_ROWS, 2])
+    assert math.isnan(frame.loc[ROUND21_HEADER_ROWS + 1, 7])
+
+    (rec,) = _parse_round21(path)  # A-2 has no UPC
+    assert rec["SKU"] == "A-1"
+    assert rec["Color"] == ""
+    assert rec["Title"] == "A 1"  # synthesized from the SKU
+
+
+def test_stops_at_customer_po(tmp_path):
+    path = _write_xlsx(tmp_path / "r.xlsx", [
+        {0: "A-1", 7: "036000291452"},
+        {0: "Customer PO", 7: "036000291452"},
+        {0: "A-2", 7: "036000291452"},
+    ])
+    assert [rec["SKU"] for rec in _parse_round21(path)] == ["A-1"]
+
+
+def test_csv_cells_are_read_as_text(round21_csv):
+    path = round21_csv([
+        {0: "007", 2: "Tee", 7: "036000291452", 10: "5.50"},
+        {0: "1001", 2: "Cap", 7: "36000291452"},
+    ])
+    first, second = _parse_round21(path)
+    assert (first["SKU"], first["UPC"], first["Price"]) == ("007", "036000291452", "5.50")
+    assert (second["SKU"], second["UPC"], second["Price"]) == ("1001", "36000291452", "")
+    assert first["row"] == ROUND21_HEADER_ROWS + 1
+
+
+def test_preview_rows_match_the_full_read(tmp_path):
+    rows = [{0: f"S-{i}", 2: "Tee", 7: f"0360002914{i:02d}", 10: i} for i in range(30)]
+    rows[20][7] = 36000291452.5  # a float far below the preview window
+    path = _write_xlsx(tmp_path / "r.xlsx", rows)
+    assert _parse_round21(path, max_rows=10) == _parse_round21(path)[:10]
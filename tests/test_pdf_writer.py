@@ -0,0 +1,83 @@
+import os
+
+import pypdfium2 as pdfium
+import pytest
+from PIL import Image, ImageDraw
+
+from barcode_gen import FONTS
+from pdf_vector import PdfLabelCanvas, VectorPdfWriter
+from pdf_writer import StreamingPdfWriter, encode_image
+
+
+def _label(mode: str) -> Image.Image:
+    img = Image.new(mode, (200, 100), "white")
+    ImageDraw.Draw(img).rectangle((20, 20, 60, 80), fill="black")
+    return img
+
+
+def _pages(path: str) -> list:
+    pdf = pdfium.PdfDocument(path)
+    try:
+        return [pdf[i].get_size() for i in range(len(pdf))]
+    finally:
+        pdf.close()
+
+
+def test_pages_of_every_image_mode(tmp_path):
+    path = str(tmp_path / "labels_bundle.pdf")
+    with StreamingPdfWriter(path) as pdf:
+        for mode in ("1", "L", "RGB"):
+            pdf.add_image_page(_label(mode))
+        first = pdf.add_image_page(encode_image(_label("1")))
+        pdf.add_image_page(None, first, (200, 100))  # the same image again
+        assert pdf.page_count == 5
+    assert _pages(path) == [(200.0, 100.0)] * 5
+    assert os.listdir(tmp_path) == ["labels_bundle.pdf"]
+
+
+def test_image_is_drawn_as_given(tmp_path):
+    path = str(tmp_path / "labels_bundle.pdf")
+    with StreamingPdfWriter(path) as pdf:
+        pdf.add_image_page(_label("1"))
+    pdf = pdfium.PdfDocument(path)
+    try:
+        rendered = pdf[0].render(scale=1).to_pil().convert("L")
+    finally:
+        pdf.close()
+    assert rendered.getpixel((40, 50)) < 64
+    assert rendered.getpixel((120, 50)) > 192
+
+
+def test_nothing_at_path_until_closed(tmp_path):
+    path = str(tmp_path / "labels_bundle.pdf")
+    pdf = StreamingPdfWriter(path)
+    pdf.add_image_page(_label("1"))
+    assert not os.path.exists(path)
+    pdf.close()
+    assert _pages(path) == [(200.0, 100.0)]
+
+
+def test_failed_job_leaves_no_pdf(tmp_path):
+    path = str(tmp_path / "labels_bundle.pdf")
+    with pytest.raises(RuntimeError):
+        with StreamingPdfWriter(path) as pdf:
+            pdf.add_image_page(_label("1"))
+            raise RuntimeError("render failed")
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.skipif(FONTS.path is None, reason="vector pages need a TrueType font")
+def test_vector_pages_embed_their_text(tmp_path):
+    path = str(tmp_path / "labels_bundle.pdf")
+    canvas = PdfLabelCanvas(400, 200)
+    canvas.text((20, 20), "SKU 0042-M", FONTS.get(40))
+    canvas.rectangle((20, 120, 60, 180))
+    with VectorPdfWriter(path, FONTS.path) as pdf:
+        form = pdf.add_vector_page(canvas.page())
+        pdf.add_vector_page(None, form, (400, 200))
+    pdf = pdfium.PdfDocument(path)
+    try:
+        assert len(pdf) == 2
+        assert "SKU 0042-M" in pdf[1].get_textpage().get_text_range()
+    finally:
+        pdf.close()
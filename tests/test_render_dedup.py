@@ -0,0 +1,80 @@
+import os
+
+import pypdfium2 as pdfium
+
+import barcode_gen
+from barcode_gen import _label_filenames, _render_key, _render_options, generate_labels_bundle
+from render_cache import RenderCache
+
+REC = {"row": 12, "SKU": "TEE-BLK-M", "Title": "Tee", "Color": "Black", "UPC": "036000291452", "Price": "9.99"}
+TEE = {0: "TEE-BLK-M", 2: "Tee", 7: "036000291452", 8: "Black"}
+CAP = {0: "CAP-RED", 2: "Cap", 7: "042100005264", 8: "Red"}
+
+
+def _options(**overrides):
+    options = _render_options(False, False, False, False, "raster", True)
+    options.update(overrides)
+    return options
+
+
+def test_render_key_follows_the_fields_the_label_draws():
+    key = _render_key("round21", _options(), REC)
+    assert _render_key("round21", _options(), {**REC, "row": 40}) == key
+    assert _render_key("round21", _options(), {**REC, "Price": "1.00"}) == key
+    assert _render_key("round21", _options(), {**REC, "Title": "Tank"}) != key
+    assert _render_key("round21", _options(), {**REC, "UPC": "042100005264"}) != key
+
+
+def test_render_key_follows_the_options():
+    key = _render_key("round21", _options(), REC)
+    with_price = _render_key("round21", _options(include_price=True), REC)
+    assert with_price != key
+    assert _render_key("round21", _options(include_price=True), {**REC, "Price": "1.00"}) != with_price
+    assert _render_key("round21", _options(vector=True), REC) != key
+    assert _render_key("round21", _options(hot_market=True), REC) != key
+
+
+def test_identical_rows_render_once(tmp_path, round21_csv):
+    path = round21_csv([TEE, CAP, TEE])
+    results = generate_labels_bundle(path, "round21", False, None, str(tmp_path / "job"), workers=1, use_cache=False)
+
+    assert results["errors"] == []
+    assert results["stats"]["dedup"] == {"labels": 3, "unique": 2}
+    tee, cap, tee_again = results["png_paths"]
+    assert len({tee, cap, tee_again}) == 3
+    assert os.path.samefile(tee, tee_again)
+    assert not os.path.samefile(tee, cap)
+    pdf = pdfium.PdfDocument(results["pdf_path"])
+    try:
+        assert len(pdf) == 3
+    finally:
+        pdf.close()
+
+
+def test_render_cache_is_reused_by_the_next_job(tmp_path, round21_csv, monkeypatch):
+    monkeypatch.setattr(barcode_gen, "RENDER_CACHE", RenderCache(str(tmp_path / "cache"), 64 * 1024 * 1024))
+    path = round21_csv([TEE, CAP, TEE])
+
+    first = generate_labels_bundle(path, "round21", False, None, str(tmp_path / "first"), workers=1)
+    second = generate_labels_bundle(path, "round21", False, None, str(tmp_path / "second"), workers=1)
+    assert first["stats"]["render_cache"]["misses"] == 2
+    assert second["stats"]["render_cache"]["hits"] == 2
+    assert second["stats"]["render_cache"]["misses"] == 0
+    for a, b in zip(first["png_paths"], second["png_paths"]):
+        with open(a, "rb") as fa, open(b, "rb") as fb:
+            assert fa.read() == fb.read()
+
+    # A different option is a different label, not a hit
+    third = generate_labels_bundle(path, "round21", False, None, str(tmp_path / "third"), hot_market=True, workers=1)
+    assert third["stats"]["render_cache"]["hits"] == 0
+
+
+def test_every_row_gets_its_own_file_name():
+    hunter_harms = [(0, {"SKU": "HH 1", "Size": "M"}), (1, {"SKU": "HH 1", "Size": "M"}),
+                    (2, {"SKU": "HH 1", "Size": "L"}), (3, {"SKU": "HH 1", "Size": "M"})]
+    names = _label_filenames("hunter_harms", hunter_harms)
+    assert names == ["HH_1_M.png", "HH_1_M_1.png", "HH_1_L.png", "HH_1_M_3.png"]
+    assert _label_filenames("hunter_harms", hunter_harms[:2]) == names[:2]
+
+    round21 = [(0, {"SKU": "A_1"}), (1, {"SKU": "A"}), (2, {"SKU": "A/B"})]
+    assert _label_filenames("round21", round21) == ["A_1.png", "A_1_1.png", "A-B_2.png"]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from barcode_gen import encode_upc, upc_check_digit, validate_upcs
+
+
+def test_check_digit_added_and_verified():
+    column = validate_upcs(["03600029145", "036000291452", "036000291453", "0360-0029-1452"])
+    assert column.upc12 == ["036000291452", "036000291452", None, "036000291452"]
+    assert column.errors[2] == "UPC check digit should be 2, got '036000291453'"
+    assert column.patterns[0] == encode_upc("036000291452")
+
+
+def test_whole_floats_lose_only_their_point_zero():
+    upc11 = "36000291452"
+    upc12 = upc11 + upc_check_digit(upc11)
+    column = validate_upcs([float(upc11), np.float64(upc11), f"{upc11}.0", int(upc11), f"{upc11}.00", "1.5.0"])
+    assert column.upc12 == [upc12, upc12, upc12, upc12, None, None]
+    assert column.errors[4] == f"UPC must have 11 or 12 digits, got '{upc11}.00'"
+
+
+def test_nul_in_a_value_does_not_shift_later_rows():
+    column = validate_upcs(["abc\0", "036000\x00291452", "12345", "03600029145"])
+    assert column.upc12 == [None, "036000291452", None, "036000291452"]
+    assert column.errors[0].startswith("UPC must have 11 or 12 digits")
+    assert column.errors[2] == "UPC must have 11 or 12 digits, got '12345'"
+
+
+def test_empty_column():
+    assert validate_upcs([]) == ([], [], [])
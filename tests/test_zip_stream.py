@@ -0,0 +1,97 @@
+import io
+import os
+import uuid
+import zipfile
+
+import pytest
+
+import zip_stream
+from zip_stream import png_entries, stream_zip, write_zip
+
+
+@pytest.fixture
+def png_dir(tmp_path):
+    folder = tmp_path / "png"
+    folder.mkdir()
+    files = {
+        "A-1.png": os.urandom(300),
+        "B_2.png": b"",
+        "big.png": os.urandom(3 * 1024 + 17),  # read in several chunks below
+        "Größe_M.png": b"\x89PNG",
+    }
+    for name, data in files.items():
+        (folder / name).write_bytes(data)
+    (folder / "notes.txt").write_text("not a label")
+    return str(folder), files
+
+
+def _check_zip(data: bytes, files: dict):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == sorted(files)
+        for info in zf.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert zf.read(info) == files[info.filename]
+
+
+def test_stream_zip_is_a_valid_archive(png_dir):
+    folder, files = png_dir
+    _check_zip(b"".join(stream_zip(png_entries(folder), chunk_size=1024)), files)
+
+
+def test_write_zip_matches_the_stream(png_dir, tmp_path):
+    folder, files = png_dir
+    path = str(tmp_path / "labels_png.zip")
+    size = write_zip(png_entries(folder), path, chunk_size=1024)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert size == len(data)
+    assert data == b"".join(stream_zip(png_entries(folder), chunk_size=1024))
+    _check_zip(data, files)
+
+
+def test_zip64_end_records_when_entries_outgrow_the_classic_count(png_dir, monkeypatch):
+    folder, files = png_dir
+    monkeypatch.setattr(zip_stream, "ZIP_MAX_ENTRIES", 2)
+    data = b"".join(stream_zip(png_entries(folder)))
+    assert b"PK\x06\x06" in data
+    _check_zip(data, files)
+
+
+def test_cache_is_kept_only_for_a_complete_stream(png_dir, tmp_path):
+    folder, files = png_dir
+    cache_path = str(tmp_path / "cached.zip")
+
+    stream = stream_zip(png_entries(folder), cache_path=cache_path, chunk_size=1024)
+    next(stream)
+    stream.close()  # client went away
+    assert os.listdir(tmp_path) == ["png"]
+
+    data = b"".join(stream_zip(png_entries(folder), cache_path=cache_path, chunk_size=1024))
+    with open(cache_path, "rb") as f:
+        assert f.read() == data
+    assert sorted(os.listdir(tmp_path)) == ["cached.zip", "png"]
+
+
+def test_download_waits_for_the_job_to_finish():
+    import app
+
+    job = f"job_{uuid.uuid4().hex}"
+    session_dir = os.path.join(app.OUTPUT_DIR, job)
+    os.makedirs(os.path.join(session_dir, "png"))
+    with open(os.path.join(session_dir, "png", "A-1.png"), "wb") as f:
+        f.write(b"\x89PNG")
+    app.JOBS.enqueue(job, {"out_dir": session_dir})
+    client = app.app.test_client()
+
+    assert client.get(f"/download/zip/{job}").status_code == 409
+    app.JOBS.claim("test:0")
+    assert client.get(f"/download/zip/{job}").status_code == 409
+    assert not os.path.exists(os.path.join(session_dir, "labels_png.zip"))
+
+    app.JOBS.finish(job, {"count": 1})
+    response = client.get(f"/download/zip/{job}")
+    assert response.status_code == 200
+    _check_zip(response.get_data(), {"A-1.png": b"\x89PNG"})
+    response.close()
+    assert os.path.exists(os.path.join(session_dir, "labels_png.zip"))
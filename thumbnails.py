@@ -0,0 +1,144 @@
+import io
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Union
+
+from PIL import Image, features
+
+from render_cache import link_or_copy
+
+
+# ---------------- Label thumbnails ----------------
+
+# Bounding box of each derivative size (labels are 1400x900)
+DERIVATIVE_SIZES = {"thumb": (480, 320), "preview": (960, 640)}
+
+THUMB_FORMAT = os.environ.get("BARCODE_THUMB_FORMAT", "webp").lower()
+if THUMB_FORMAT not in ("webp", "png"):
+    raise ValueError(f"BARCODE_THUMB_FORMAT must be 'webp' or 'png', got '{THUMB_FORMAT}'")
+if THUMB_FORMAT == "webp" and not features.check("webp"):
+    THUMB_FORMAT = "png"
+
+# Derivatives generated for folders they aren't written to (saved sets from before thumbnails)
+THUMB_MEMORY_ITEMS = int(os.environ.get("BARCODE_THUMB_MEMORY_ITEMS", "256"))
+
+MIMETYPES = {"webp": "image/webp", "png": "image/png"}
+
+
+def _derivative_paths(folder: str, fname: str, size: str) -> tuple:
+    """Where a derivative may be: the scaled image, or a link to the original when that is smaller"""
+    base = os.path.join(folder, "thumbs", size, os.path.splitext(fname)[0])
+    return f"{base}.{THUMB_FORMAT}", f"{base}.png" if THUMB_FORMAT != "png" else f"{base}.orig.png"
+
+
+def _encode(png_path: str, size: str) -> Union[bytes, None]:
+    """The label scaled into the size's box, or None if that wouldn't be smaller than the PNG"""
+    with Image.open(png_path) as img:
+        # Bilevel labels are scaled in grayscale, so text stays legible
+        img = img.convert("L" if img.mode in ("1", "L", "LA", "P") else "RGB")
+    img.thumbnail(DERIVATIVE_SIZES[size], Image.LANCZOS, reducing_gap=2.0)
+    buf = io.BytesIO()
+    if THUMB_FORMAT == "webp":
+        img.save(buf, "WEBP", quality=70, method=4)
+    else:
+        img.save(buf, "PNG", optimize=True)
+    data = buf.getvalue()
+    # 1-bit PNGs are often smaller than any grayscale thumbnail of them
+    return data if len(data) < os.path.getsize(png_path) else None
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+
+
+def write_derivatives(folder: str, fnames: list, sizes: tuple = tuple(DERIVATIVE_SIZES)) -> int:
+    """
+    Write the derivatives of folder/png/<fname> that don't exist yet, under
+    folder/thumbs/<size>/. Best effort: a label that can't be read is
+    skipped. Returns how many were written.
+    """
+    written = 0
+    for fname in fnames:
+        png_path = os.path.join(folder, "png", fname)
+        for size in sizes:
+            scaled, original = _derivative_paths(folder, fname, size)
+            if os.path.exists(scaled) or os.path.exists(original):
+                continue
+            try:
+                data = _encode(png_path, size)
+                os.makedirs(os.path.dirname(scaled), exist_ok=True)
+                if data is None:
+                    link_or_copy(png_path, original)
+                else:
+                    _write_atomic(scaled, data)
+            except OSError:
+                continue
+            written += 1
+    return written
+
+
+class _MemoryLRU:
+    """Encoded derivatives by (path, mtime, size), least recently used dropped first"""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+_MEMORY = _MemoryLRU(THUMB_MEMORY_ITEMS)
+
+
+def load_derivative(folder: str, fname: str, size: str, persist: bool = True) -> Union[tuple, None]:
+    """
+    (path or bytes, mimetype) of a label derivative, or None if the label
+    doesn't exist. Missing derivatives are generated on demand: written
+    next to the label when persist is set (job folders), otherwise kept
+    in a per-process LRU so older saved sets are never modified.
+    """
+    png_path = os.path.join(folder, "png", fname)
+    if not os.path.exists(png_path):
+        return None
+    if persist:
+        write_derivatives(folder, [fname], (size,))
+    scaled, original = _derivative_paths(folder, fname, size)
+    if os.path.exists(scaled):
+        return scaled, MIMETYPES[THUMB_FORMAT]
+    if os.path.exists(original):
+        return original, "image/png"
+
+    st = os.stat(png_path)
+    key = (png_path, st.st_mtime_ns, size)
+    data = _MEMORY.get(key)
+    if data is None:
+        try:
+            data = _encode(png_path, size)
+        except OSError:
+            return png_path, "image/png"
+        # b"": the original is the smaller one
+        data = data or b""
+        _MEMORY.put(key, data)
+    return (data, MIMETYPES[THUMB_FORMAT]) if data else (png_path, "image/png")